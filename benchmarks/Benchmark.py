@@ -0,0 +1,177 @@
+#!/usr/bin/python3
+
+##
+# Date: 17.10.2026
+
+import argparse
+import gc
+import itertools
+import json
+import os.path as op
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable
+import SyntheticData as sd
+
+
+def measure(function: Callable, repeat: int, setup: Callable|None=None) -> dict:
+    """ Run `function` `repeat` times (each run after `setup`) and return statistics of run times in seconds """
+    runs:list[float] = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        runs.append(time.perf_counter() - start)
+    return {'runs': runs, 'min': min(runs), 'median': statistics.median(runs), 'mean': statistics.mean(runs)}
+
+
+def measure_memory(function: Callable) -> int:
+    """ Return size of memory (in bytes) allocated by `function` which is still allocated after it returns """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function() # keep the result alive until it is measured
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+def run_benchmarks(data_dir: str, tickers: int, records: int, years: int, repeat: int, graph_tickers: int) -> dict:
+    """ Generate workbook, run all benchmarks and return the results. All generated data are stored in `data_dir` """
+    sd.install_fakes(data_dir)
+    import DataLoader as dl
+    import FinDataPuller as fdp
+    import Portfolio as pf
+
+    xlsx_path = op.join(data_dir, 'portfolio.xlsx')
+    sd.generate_workbook(xlsx_path, tickers, records, years)
+    results:dict = dict()
+    memory:dict = dict()
+    results['memory'] = memory
+
+    # Excel parsing
+    results['read_portfolio_excel'] = measure(lambda: dl.DataLoader().read_portfolio_excel(xlsx_path), repeat)
+    loader = dl.DataLoader()
+    loader.read_portfolio_excel(xlsx_path)
+    all_tickers = loader.get_all_tickers()
+    for ticker in all_tickers:
+        sd.fake_close_values(ticker) # generate fake market data outside of measured code
+    pf.curr_conv.convert(1, 'USD', 'EUR') # ECB rates are loaded lazily on the first conversion
+
+    # Asset construction (including pulling of fake history data)
+    state:dict = dict()
+    def new_portfolio() -> None:
+        state['portfolio'] = pf.Portfolio(loader, fdp.FinanceData())
+    def construct_assets() -> None:
+        for ticker in all_tickers:
+            state['portfolio'].construct_asset(ticker)
+    results['construct_asset'] = measure(construct_assets, repeat, new_portfolio)
+    portfolio:pf.Portfolio = state['portfolio']
+
+    # Memory of assets with their history data (workbook data are already loaded)
+    def construct_memory_portfolio() -> pf.Portfolio:
+        memory_portfolio = pf.Portfolio(loader, fdp.FinanceData())
+        for ticker in all_tickers:
+            memory_portfolio.construct_asset(ticker)
+        return memory_portfolio
+    memory['bytes_per_asset'] = measure_memory(construct_memory_portfolio) / len(all_tickers)
+
+    # Evolution of whole portfolio (from scratch, without cached views)
+    results['get_evolution_data'] = measure(portfolio.get_evolution_data, repeat, portfolio._reset_evolution_matrix)
+
+    # Switching of uniform currency (with refreshing of portfolio evolution as the GUI does), each run switches to the next currency
+    currencies = itertools.cycle(pf.CURRENCIES[1:] + pf.CURRENCIES[:1])
+    def change_currency() -> None:
+        portfolio.make_currency_conversion(next(currencies))
+        portfolio.get_evolution_data()
+    results['make_currency_conversion'] = measure(change_currency, repeat)
+
+    # Tables shown after each refresh of the GUI, they are computed again only when the portfolio changes
+    def refresh_tables() -> None:
+        portfolio.get_summary_data()
+        portfolio.get_total_invested()
+        portfolio.get_assets_data()
+        portfolio.get_analytics_data()
+    results['refresh_tables'] = measure(refresh_tables, repeat)
+    # Live prices of all assets (fake quotes) and refresh of tables, only the last day of evolutions is updated
+    quotes_puller = fdp.FinanceData()
+    def update_live_quotes() -> None:
+        portfolio.update_live_quotes(quotes_puller.pull_live_quotes(all_tickers))
+        refresh_tables()
+        portfolio.get_evolution_data()
+    results['update_live_quotes'] = measure(update_live_quotes, repeat)
+    results['view_statistics'] = {name: statistics._asdict() for name, statistics in portfolio.get_view_statistics().items()}
+
+    # Graph rendering
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import Controller as ct
+        import IM_gui as gui
+    except ImportError as e:
+        print(f"Graph benchmark skipped: {e}", file=sys.stderr)
+    else:
+        controller = ct.Controller()
+        controller._portfolio = portfolio
+        graph = gui.GraphLayout()
+        graph._controller = controller
+        shown = gui.DEFAULT_GRAPH_TICKERS + all_tickers[:graph_tickers]
+        results['update_graph'] = measure(lambda: graph.update_graph(shown), repeat, lambda: graph.update_graph([]))
+
+    return results
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """ Print median times of `results` compared with `baseline` results """
+    print(f"{'benchmark':<28}{'baseline [s]':>14}{'current [s]':>14}{'speedup':>10}")
+    for name, result in results['results'].items():
+        if name in baseline['results'] and 'median' in result:
+            base = baseline['results'][name]['median']
+            print(f"{name:<28}{base:>14.4f}{result['median']:>14.4f}{base / result['median']:>9.2f}x")
+    for name, size in results['results']['memory'].items():
+        base = baseline['results'].get('memory', dict()).get(name)
+        print(f"{name:<28}{base if base is not None else float('nan'):>14.0f}{size:>14.0f}{base / size if base else float('nan'):>9.2f}x")
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Invest Manager benchmarks on synthetic workbook with offline market and ECB data")
+    parser.add_argument('--tickers', type=int, default=40, help="number of assets (default: 40)")
+    parser.add_argument('--records', type=int, default=50, help="number of records of each asset (default: 50)")
+    parser.add_argument('--years', type=int, default=10, help="years of history (default: 10)")
+    parser.add_argument('--repeat', type=int, default=5, help="number of runs of each benchmark (default: 5)")
+    parser.add_argument('--graph-tickers', type=int, default=10, help="number of asset lines in graph benchmark (default: 10)")
+    parser.add_argument('-o', '--output', help="JSON file for results (default: standard output)")
+    parser.add_argument('--compare', help="JSON results of previous run to compare with")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    with tempfile.TemporaryDirectory(prefix='im-bench-') as data_dir:
+        results = {
+            'config': {'tickers': args.tickers, 'records': args.records, 'years': args.years, 'repeat': args.repeat, 'graph_tickers': args.graph_tickers},
+            'environment': {'python': platform.python_version(), 'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': run_benchmarks(data_dir, args.tickers, args.records, args.years, args.repeat, args.graph_tickers),
+        }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+# END OF FILE #
@@ -0,0 +1,144 @@
+##
+# Date: 17.10.2026
+
+import os.path as op
+import sys
+import zlib
+import datetime as dt
+from functools import lru_cache
+from types import SimpleNamespace
+from zipfile import ZipFile, ZIP_DEFLATED
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+# Application modules
+SRC_PATH:str = op.join(op.dirname(op.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC_PATH)
+
+TEMPLATE_PATH:str = op.join(op.dirname(op.abspath(__file__)), '..', 'portfolio-template.xlsx')
+# Currencies of generated assets and ECB rates
+FAKE_CURRENCIES:list = ['EUR', 'USD', 'GBP', 'CHF', 'CZK']
+# Categories of the template `category_tab`
+TEMPLATE_CATEGORIES:list = ['Comodity', 'Crypto', 'ETF', 'Stock']
+# First day of fake market and ECB data
+FAKE_DATA_START:dt.date = dt.date(1999, 1, 4)
+# Number of live quotes of each ticker returned by `FakeTicker.fast_info`, each quote is a small step from the previous one
+_quote_ticks:dict[str, int] = dict()
+
+
+def _seed(name: str) -> int:
+    """ Deterministic seed of random generator for the given name """
+    return zlib.crc32(name.encode())
+
+
+def generate_workbook(path: str, tickers: int, records: int, years: int, sold_ratio: float=0.3, seed: int=0) -> None:
+    """
+    Generate workbook in shape of `portfolio-template.xlsx`.
+    tickers: number of assets
+    records: number of buy records of each asset
+    years: length of history (the first buy is `years` ago)
+    sold_ratio: ratio of records which are sold
+    """
+    rng = np.random.default_rng(seed)
+    today = dt.datetime.combine(dt.date.today(), dt.time())
+    days = max(1, years * 365)
+    wb = load_workbook(TEMPLATE_PATH)
+    rec_ws, assets_ws, results_ws = wb['Records'], wb['Assets'], wb['Results']
+
+    row = 3
+    for i in range(tickers):
+        ticker = f"TIC{i:04d}"
+        category = TEMPLATE_CATEGORIES[i % len(TEMPLATE_CATEGORIES)]
+        currency = FAKE_CURRENCIES[i % len(FAKE_CURRENCIES)]
+        buy_offsets = np.sort(rng.integers(0, days, records))
+        buy_offsets[0] = 0 # first buy exactly `years` ago
+        invested, owned = 0.0, 0.0
+        for offset in buy_offsets:
+            buy_date = today - dt.timedelta(days=days) + dt.timedelta(days=int(offset))
+            amount = float(rng.integers(1, 20))
+            price = float(rng.uniform(10, 500))
+            sell_date = None
+            if rng.random() < sold_ratio:
+                sell_date = buy_date + dt.timedelta(days=int(rng.integers(0, (today - buy_date).days + 1)))
+            else:
+                invested += amount * price
+                owned += amount
+            values = [ticker, category, 'Broker', buy_date, amount, price, amount * price, sell_date, None, None, None]
+            for col, value in enumerate(values):
+                rec_ws.cell(row=row, column=2 + col, value=value)
+            row += 1
+
+        first_buy = today - dt.timedelta(days=days)
+        for col, value in enumerate([ticker, f"Asset {ticker}", category, currency, 'Field', first_buy]):
+            assets_ws.cell(row=3 + i, column=2 + col, value=value)
+        for col, value in enumerate([ticker, invested, invested / owned if owned else 0.0, owned]):
+            results_ws.cell(row=3 + i, column=2 + col, value=value)
+
+    rec_ws.tables['rec_tab'].ref = f"B2:L{max(row - 1, 3)}"
+    assets_ws.tables['tic_tab'].ref = f"B2:G{max(2 + tickers, 3)}"
+    results_ws.tables['results_tab'].ref = f"B2:E{max(2 + tickers, 3)}"
+    wb.save(path)
+
+
+@lru_cache(maxsize=None)
+def fake_close_values(ticker: str) -> pd.Series:
+    """ Deterministic daily close values of `ticker` for business days from `FAKE_DATA_START` until yesterday """
+    rng = np.random.default_rng(_seed(ticker))
+    index = pd.bdate_range(FAKE_DATA_START, dt.date.today() - dt.timedelta(days=1), tz='America/New_York')
+    return pd.Series(rng.uniform(20, 200) * np.exp(np.cumsum(rng.normal(0.0002, 0.01, len(index)))), index=index)
+
+
+class FakeTicker:
+    """ Replacement of `yfinance.Ticker` which returns `fake_close_values` and live quotes moving around the last of them """
+
+    def __init__(self, ticker: str) -> None:
+        self._ticker = ticker
+
+    def history(self, start=None, end=None, raise_errors: bool=False, **kwargs) -> pd.DataFrame:
+        values = fake_close_values(self._ticker)
+        start = pd.Timestamp(start or FAKE_DATA_START).tz_localize(values.index.tz)
+        end = pd.Timestamp(end or dt.date.today()).tz_localize(values.index.tz)
+        values = values[(values.index >= start) & (values.index < end)]
+        if values.empty and raise_errors:
+            raise Exception(f"{self._ticker}: no price data found")
+        return pd.DataFrame({'Close': values})
+
+    @property
+    def fast_info(self) -> dict:
+        """ Deterministic live quote: random walk from the last fake close, it moves by one step on each access """
+        tick = _quote_ticks[self._ticker] = _quote_ticks.get(self._ticker, 0) + 1
+        steps = np.random.default_rng(_seed(self._ticker)).normal(0, 0.002, tick)
+        return {'lastPrice': float(fake_close_values(self._ticker).iloc[-1] * np.exp(steps.sum()))}
+
+
+def write_fake_ecb_zip(path: str) -> None:
+    """ Write deterministic ECB history file (zip with csv in the ECB format) to `path` """
+    index = pd.bdate_range(FAKE_DATA_START, dt.date.today() - dt.timedelta(days=1))
+    currencies = [c for c in FAKE_CURRENCIES if c != 'EUR']
+    columns = []
+    for currency in currencies:
+        rng = np.random.default_rng(_seed(currency))
+        columns.append(rng.uniform(0.5, 30) * np.exp(np.cumsum(rng.normal(0, 0.003, len(index)))))
+    lines = ["Date," + ",".join(currencies) + ","]
+    for i in range(len(index) - 1, -1, -1):
+        lines.append(f"{index[i]:%Y-%m-%d}," + ",".join(f"{column[i]:.4f}" for column in columns) + ",")
+    with ZipFile(path, 'w', ZIP_DEFLATED) as archive:
+        archive.writestr('eurofxref-hist.csv', "\n".join(lines) + "\n")
+
+
+def install_fakes(data_dir: str) -> None:
+    """
+    Replace yfinance and the ECB download by local deterministic data. Data directories (`ecb_data`, `price_data`) are created in `data_dir`.
+    It has to be called before `Portfolio` is imported.
+    """
+    import AppPaths
+    import CurrencyConverter as cc
+    import FinDataPuller as fdp
+
+    AppPaths.get_application_path = lambda: data_dir
+    cc.urllib = SimpleNamespace(request=SimpleNamespace(urlretrieve=lambda url, path: write_fake_ecb_zip(path)))
+    fdp.yf = SimpleNamespace(Ticker=FakeTicker)
+
+
+# END OF FILE #
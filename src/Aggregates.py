@@ -0,0 +1,98 @@
+##
+# Date: 17.10.2026
+
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+
+
+# Frequencies of aggregated levels from the finest to the coarsest (weekly, monthly)
+LEVEL_FREQUENCIES:list = ['W', 'M']
+
+
+class Level(NamedTuple):
+    """ Daily values aggregated to periods of one frequency. Arrays have one row for each series and one column for each period """
+    frequency: str
+    dates: pd.DatetimeIndex # the last day of each period
+    starts: np.ndarray # position of the first day of each period in daily values
+    last: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+    returns: np.ndarray # change of the last value against the last value of the previous period (the first period against its first day)
+
+
+def _get_period_starts(dates: pd.DatetimeIndex, frequency: str) -> np.ndarray:
+    """ Return positions of the first days of periods in `dates` (sorted days) """
+    periods = dates.to_period(frequency).asi8
+    return np.flatnonzero(np.concatenate([[True], periods[1:] != periods[:-1]]))
+
+
+def _aggregate(values: np.ndarray, starts: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """ Return (last, minimum, maximum, returns) of periods starting on `starts` positions of `values` (series x days), NaN values are skipped """
+    ends = np.append(starts[1:], values.shape[1]) - 1
+    last = values[:, ends]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        minimum = np.fmin.reduceat(values, starts, axis=1)
+        maximum = np.fmax.reduceat(values, starts, axis=1)
+        previous = np.concatenate([values[:, starts[:1]], last[:, :-1]], axis=1)
+        returns = np.where(previous != 0, last / previous - 1, np.nan)
+    return last, minimum, maximum, returns
+
+
+def build_levels(dates: pd.DatetimeIndex, values: np.ndarray) -> dict[str, Level]:
+    """
+    Aggregate daily `values` (series x days, NaN for days without value) to all levels of `LEVEL_FREQUENCIES`.
+    """
+    levels:dict[str, Level] = dict()
+    for frequency in LEVEL_FREQUENCIES:
+        starts = _get_period_starts(dates, frequency)
+        ends = np.append(starts[1:], len(dates)) - 1
+        levels[frequency] = Level(frequency, dates[ends], starts, *_aggregate(values, starts))
+    return levels
+
+
+def _get_first_updated_period(level: Level, position: int) -> int:
+    """ Return the first period of `level` aggregated again after a change from `position` """
+    # The previous period is included, because return of the first changed period depends on it
+    return max(int(np.searchsorted(level.starts, position, side='right')) - 2, 0)
+
+
+def get_update_start(levels: dict[str, Level], position: int) -> int:
+    """ Return position of the first day whose values are needed by `update_levels` after a change from `position` """
+    return min(int(level.starts[_get_first_updated_period(level, position)]) for level in levels.values())
+
+
+def update_levels(levels: dict[str, Level], values: np.ndarray, position: int, values_start: int=0) -> None:
+    """
+    Update periods of `levels` after daily `values` were changed from `position` to the end. Only the periods which contain changed
+    days (and returns of the following period) are aggregated again, so a change of the last day updates just the last period.
+    Dates of the values must stay the same.
+    values_start: position of the first day of `values`, it must not be after `get_update_start(levels, position)`
+    """
+    for level in levels.values():
+        first = _get_first_updated_period(level, position)
+        start = level.starts[first]
+        last, minimum, maximum, returns = _aggregate(values[:, start - values_start:], level.starts[first:] - start)
+        level.last[:, first:] = last
+        level.minimum[:, first:] = minimum
+        level.maximum[:, first:] = maximum
+        # Return of the first aggregated period is counted just against its first day
+        level.returns[:, first + 1:] = returns[:, 1:]
+        if first == 0:
+            level.returns[:, 0] = returns[:, 0]
+
+
+def select_level(levels: dict[str, Level], date_from: pd.Timestamp|None, date_to: pd.Timestamp|None, points: int) -> Level|None:
+    """
+    Return the coarsest level which has at least `points` periods ending between `date_from` and `date_to`.
+    Return `None` if no level has enough periods (daily values have to be used).
+    """
+    for frequency in reversed(LEVEL_FREQUENCIES):
+        level = levels[frequency]
+        start, stop = level.dates.slice_locs(date_from, date_to)
+        if stop - start >= points:
+            return level
+    return None
+
+
+# END OF FILE #
@@ -0,0 +1,105 @@
+##
+# Date: 17.10.2026
+
+from typing import NamedTuple
+import numpy as np
+
+
+# Length of window of rolling volatility in days (one year)
+VOLATILITY_WINDOW:int = 365
+# Daily values are calendar days (prices of other than trading days are filled)
+DAYS_PER_YEAR:float = 365.0
+
+
+class Analytics(NamedTuple):
+    """ Analytics of several series (assets and portfolio), arrays have one row (or value) for each series """
+    returns: np.ndarray # daily time-weighted returns (series x days)
+    growth: np.ndarray # growth of one unit invested on the first day, cash flows do not affect it (series x days)
+    twr: np.ndarray # time-weighted return of the whole period
+    annualized_return: np.ndarray # time-weighted return per year
+    max_drawdown: np.ndarray # the largest drop of growth from its previous peak (negative number)
+    rolling_volatility: np.ndarray # annualized standard deviation of daily returns in `VOLATILITY_WINDOW` days (series x days)
+    volatility: np.ndarray # the last value of rolling volatility (volatility of the last year)
+    peak: np.ndarray # the highest growth before the last day, at least 1.0 (see `update_last_day`)
+    previous_max_drawdown: np.ndarray # max drawdown before the last day
+
+
+def compute_analytics(values: np.ndarray, inflows: np.ndarray, outflows: np.ndarray, starts: np.ndarray,
+                      window: int=VOLATILITY_WINDOW) -> Analytics:
+    """
+    Compute analytics of all series at once.
+    values: daily values (series x days), days before the start of a series are ignored
+    inflows: daily invested money (buys), it is invested at the beginning of the day (series x days)
+    outflows: daily withdrawn money (sells), it is withdrawn at the end of the day (series x days)
+    starts: position of the first day of each series
+
+    Daily return is (value + outflow) / (previous value + inflow) - 1, so cash flows are not counted as returns. Days without invested
+    money have zero return.
+    """
+    count, days = values.shape
+    positions = np.arange(days)
+    started = positions >= starts[:, np.newaxis]
+    values = np.where(started, np.nan_to_num(values), 0.0)
+
+    previous = np.concatenate([np.zeros((count, 1)), values[:, :-1]], axis=1)
+    invested = previous + inflows
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.where(invested > 0, (values + outflows) / invested - 1, 0.0)
+
+    growth = np.cumprod(1 + returns, axis=1)
+    twr = growth[:, -1] - 1 if days else np.full(count, np.nan)
+    held_days = days - starts
+    with np.errstate(invalid='ignore', divide='ignore'):
+        annualized_return = np.where(held_days > 0, (1 + twr) ** (DAYS_PER_YEAR / np.maximum(held_days, 1)) - 1, np.nan)
+    # Peak starts at the growth of 1.0 before the first day, so a loss from the first day is a drawdown as well
+    drawdowns = growth / np.maximum(np.maximum.accumulate(growth, axis=1), 1.0) - 1
+    max_drawdown = np.min(drawdowns, axis=1, initial=0.0)
+
+    # Rolling variance from cumulative sums of returns and their squares
+    sums = np.concatenate([np.zeros((count, 1)), np.cumsum(returns, axis=1)], axis=1)
+    squares = np.concatenate([np.zeros((count, 1)), np.cumsum(returns ** 2, axis=1)], axis=1)
+    rolling_volatility = np.full((count, days), np.nan)
+    if days >= window:
+        mean = (sums[:, window:] - sums[:, :-window]) / window
+        variance = (squares[:, window:] - squares[:, :-window]) / window - mean ** 2
+        rolling_volatility[:, window - 1:] = np.sqrt(np.maximum(variance, 0) * DAYS_PER_YEAR)
+    # Windows have to contain only days of the series
+    rolling_volatility[positions < (starts[:, np.newaxis] + window - 1)] = np.nan
+    volatility = rolling_volatility[:, -1] if days else np.full(count, np.nan)
+
+    return Analytics(returns, growth, twr, annualized_return, max_drawdown, rolling_volatility, volatility,
+                     np.max(growth[:, :-1], axis=1, initial=1.0), np.min(drawdowns[:, :-1], axis=1, initial=0.0))
+
+
+def update_last_day(analytics: Analytics, rows: np.ndarray, values: np.ndarray, inflows: np.ndarray, outflows: np.ndarray,
+                    starts: np.ndarray, window: int=VOLATILITY_WINDOW) -> None:
+    """
+    Update `analytics` of series `rows` in place after their values on the last day were changed. Other days are not computed again,
+    so the update does not depend on the length of the series (volatility is computed from the last `window` returns).
+    values: values of the series on the last two days (rows x 2)
+    inflows, outflows: cash flows of the series on the last day
+    starts: position of the first day of each series
+    """
+    days = analytics.returns.shape[1]
+    previous = np.where(starts < days - 1, np.nan_to_num(values[:, 0]), 0.0)
+    value = np.where(starts <= days - 1, np.nan_to_num(values[:, 1]), 0.0)
+    invested = previous + inflows
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns = np.where(invested > 0, (value + outflows) / invested - 1, 0.0)
+        analytics.returns[rows, -1] = returns
+        growth = (analytics.growth[rows, -2] if days > 1 else 1.0) * (1 + returns)
+        analytics.growth[rows, -1] = growth
+        analytics.twr[rows] = growth - 1
+        held_days = days - starts
+        analytics.annualized_return[rows] = np.where(held_days > 0, growth ** (DAYS_PER_YEAR / np.maximum(held_days, 1)) - 1, np.nan)
+        analytics.max_drawdown[rows] = np.minimum(analytics.previous_max_drawdown[rows], growth / np.maximum(analytics.peak[rows], growth) - 1)
+
+    if days >= window:
+        window_returns = analytics.returns[rows, -window:]
+        variance = np.mean(window_returns ** 2, axis=1) - np.mean(window_returns, axis=1) ** 2
+        volatility = np.where(days >= starts + window, np.sqrt(np.maximum(variance, 0) * DAYS_PER_YEAR), np.nan)
+        analytics.rolling_volatility[rows, -1] = volatility
+        analytics.volatility[rows] = volatility
+
+
+# END OF FILE #
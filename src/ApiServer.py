@@ -0,0 +1,231 @@
+##
+# Date: 17.10.2026
+
+import asyncio
+import hashlib
+import json
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+from Portfolio import SUMMARY_HEADER, ASSETS_HEADER
+import Profiling as prof
+
+
+DEFAULT_API_HOST:str = '127.0.0.1'
+# Maximal number of cached responses (evolutions of different tickers and ranges are cached separately)
+MAX_CACHED_RESPONSES:int = 64
+# Maximal size of request line and headers
+MAX_REQUEST_SIZE:int = 16 * 1024
+_REASONS:dict[int, str] = {200: 'OK', 304: 'Not Modified', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+                          500: 'Internal Server Error'}
+
+
+class ApiError(Exception):
+
+    def __init__(self, status: int, message: str) -> None:
+        self.status = status
+        self.message = message
+        super().__init__(message)
+
+    def __str__(self) -> str:
+        return f"ApiError: {self.status} {self.message}"
+
+
+class _Response:
+    """ Cached JSON response and generation of data from which it was computed """
+
+    __slots__ = ('generation', 'status', 'body', 'etag')
+
+    def __init__(self, generation: int, status: int, body: bytes) -> None:
+        self.generation = generation
+        self.status = status
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()}"'
+
+
+def _to_json(value: any) -> any:
+    """ Replace NaN values (which are not valid JSON) by null """
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, list):
+        return [_to_json(item) for item in value]
+    return value
+
+
+class ApiServer:
+    """
+    Local HTTP server which serves views of the current portfolio as JSON (read-only, only GET and HEAD requests):
+    /summary, /assets and /evolution?ticker=...&date_from=YYYY-mm-dd&date_to=YYYY-mm-dd&points=N (whole portfolio if ticker is not given,
+    daily values if points are not given).
+
+    Responses are cached until the portfolio is reloaded or the currency is changed (see `invalidate`), they have ETag header
+    and requests with matching If-None-Match header get 304 response. The first request after a change computes the response
+    in a worker thread. Other requests of the same view do not wait for it, they get the previous response until the new one is ready.
+    """
+
+    def __init__(self, controller, host: str=DEFAULT_API_HOST, port: int=8080) -> None:
+        self._controller = controller
+        self._host:str = host
+        self._port:int = port
+        self._generation:int = 0 # incremented when data of the portfolio change
+        self._responses:OrderedDict[tuple, _Response] = OrderedDict() # the least recently used response is evicted first
+        self._computing:dict[tuple, asyncio.Future] = dict() # responses which are being computed
+        # Views are computed one by one, the portfolio is not thread-safe
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='api')
+        self._loop:asyncio.AbstractEventLoop|None = None
+        self._server:asyncio.Server|None = None
+        self._started = threading.Event()
+        self._error:Exception|None = None
+        controller.add_change_listener(self.invalidate)
+
+
+    def start(self) -> None:
+        """ Start the server in a background thread. Raise OSError if the address can not be used """
+        threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True).start()
+        self._started.wait()
+        if self._error is not None:
+            raise self._error
+
+
+    def stop(self) -> None:
+        if self._loop is not None and self._server is not None:
+            self._loop.call_soon_threadsafe(self._server.close)
+
+
+    def get_address(self) -> tuple[str, int]:
+        """ Return address on which the server listens (the port is chosen by the system if it was 0) """
+        return self._server.sockets[0].getsockname()[:2]
+
+
+    def invalidate(self) -> None:
+        """ Mark cached responses as old, it can be called from any thread """
+        self._generation += 1
+
+
+    async def _serve(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._server = await asyncio.start_server(self._handle_connection, self._host, self._port, limit=MAX_REQUEST_SIZE)
+        except OSError as e:
+            self._error = e
+            return
+        finally:
+            self._started.set()
+        async with self._server:
+            try:
+                await self._server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """ Handle one request, the connection is closed after the response """
+        method = 'GET'
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+            lines = request.decode('latin-1').split('\r\n')
+            method, target, _ = lines[0].split(' ', 2)
+            headers = {name.strip().lower(): value.strip() for name, _, value in (line.partition(':') for line in lines[1:] if line)}
+            with prof.span('api request', urlsplit(target).path):
+                status, body, etag = await self._get_response(method, target, headers.get('if-none-match'))
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            status, body, etag = 400, json.dumps({'error': 'invalid request'}).encode(), None
+
+        head = [f"HTTP/1.1 {status} {_REASONS[status]}", "Content-Type: application/json", f"Content-Length: {len(body)}",
+                "Cache-Control: no-cache", "Connection: close"]
+        if etag is not None:
+            head.append(f"ETag: {etag}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode('latin-1'))
+        if method != 'HEAD' and status != 304:
+            writer.write(body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass # the client disconnected
+        finally:
+            writer.close()
+
+
+    async def _get_response(self, method: str, target: str, if_none_match: str|None) -> tuple[int, bytes, str|None]:
+        """ Return (status, body, ETag) of response to the request """
+        if method not in ('GET', 'HEAD'):
+            return 405, json.dumps({'error': f"method {method} is not allowed"}).encode(), None
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        key = (url.path, query.get('ticker'), query.get('date_from'), query.get('date_to'), query.get('points'))
+
+        response = self._responses.get(key)
+        # When the response is being computed again, the previous one is used until the new one is ready
+        if response is None or (response.generation != self._generation and key not in self._computing):
+            response = await self._compute(key)
+        if key in self._responses:
+            self._responses.move_to_end(key)
+
+        if if_none_match is not None and (if_none_match == '*' or response.etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]):
+            return 304, b'', response.etag
+        return response.status, response.body, response.etag
+
+
+    async def _compute(self, key: tuple) -> _Response:
+        """ Compute response of `key` in a worker thread, concurrent requests of the same `key` share one computation """
+        if key not in self._computing:
+            future = asyncio.ensure_future(self._compute_response(key))
+            future.add_done_callback(lambda _: self._computing.pop(key, None))
+            self._computing[key] = future
+        # The computation is finished even if the client disconnects
+        return await asyncio.shield(self._computing[key])
+
+
+    async def _compute_response(self, key: tuple) -> _Response:
+        generation = self._generation
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(self._executor, self._get_data, *key)
+            response = _Response(generation, 200, json.dumps(data).encode())
+        except ApiError as e:
+            response = _Response(generation, e.status, json.dumps({'error': e.message}).encode())
+        except Exception as e:
+            # Failed computation is not cached, it is tried again by the next request
+            print(e)
+            return _Response(generation, 500, json.dumps({'error': str(e)}).encode())
+        self._responses[key] = response
+        if len(self._responses) > MAX_CACHED_RESPONSES:
+            self._responses.popitem(last=False)
+        return response
+
+
+    def _get_data(self, path: str, ticker: str|None, date_from: str|None, date_to: str|None, points: str|None) -> dict:
+        """ Return data of the view at `path` (it is called in a worker thread) """
+        currency = self._controller.get_current_currency()
+        match path.rstrip('/'):
+            case '/summary':
+                summary_data, invested, current = self._controller.get_summary_data()
+                return {'currency': currency, 'header': SUMMARY_HEADER, 'rows': _to_json(summary_data), 'total_invested': invested,
+                        'current_value': current}
+            case '/assets':
+                return {'currency': currency, 'header': ASSETS_HEADER, 'rows': _to_json(self._controller.get_asset_table_data())}
+            case '/evolution':
+                if points is not None and (not points.isdigit() or int(points) == 0):
+                    raise ApiError(400, f"invalid number of points: {points}")
+                try:
+                    if points is None:
+                        evolution = self._controller.get_evolution_graph(ticker, date_from, date_to)
+                    else:
+                        # Values of the coarsest resolution (monthly, weekly or daily) with at least `points` periods in the range
+                        evolution = self._controller.get_evolution_aggregates(ticker, date_from, date_to, int(points))
+                except (ValueError, TypeError, KeyError) as e:
+                    raise ApiError(400, f"invalid date range: {e}")
+                if evolution is None:
+                    raise ApiError(404, f"unknown ticker {ticker}" if ticker is not None else "portfolio is not loaded")
+                if points is None:
+                    return {'currency': currency, 'ticker': ticker or 'PORTFOLIO', 'dates': evolution.index.strftime('%Y-%m-%d').tolist(),
+                            'values': _to_json(evolution.tolist())}
+                return {'currency': currency, 'ticker': ticker or 'PORTFOLIO', 'dates': evolution.index.strftime('%Y-%m-%d').tolist(),
+                        'values': _to_json(evolution['LAST'].tolist()), 'minimum': _to_json(evolution['MIN'].tolist()),
+                        'maximum': _to_json(evolution['MAX'].tolist()), 'returns': _to_json(evolution['RETURN'].tolist())}
+            case _:
+                raise ApiError(404, f"unknown path {path}")
+
+
+# END OF FILE #
@@ -0,0 +1,28 @@
+##
+# Date: 17.10.2026
+
+import os.path as op
+from os import makedirs
+import sys
+
+
+def get_application_path() -> str:
+    """
+    Return path of the application directory. If the application is frozen (PyInstaller executable), it is the directory of the executable.
+    """
+    if getattr(sys, 'frozen', False):
+        return op.dirname(sys.executable)
+    else:
+        return op.dirname(op.abspath(__file__))
+
+
+def get_data_directory(name: str) -> str:
+    """
+    Return path of the data directory `name` in application directory. The directory is created if it does not exist.
+    """
+    directory = op.join(get_application_path(), name)
+    makedirs(directory, exist_ok=True)
+    return directory
+
+
+# END OF FILE #
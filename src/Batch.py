@@ -0,0 +1,209 @@
+##
+# Date: 17.10.2026
+
+import sys
+import multiprocessing
+import os.path as op
+from os import makedirs
+import pandas as pd
+import Controller as ct
+from DataLoader import DataLoader, DataLoaderError
+from FinDataPuller import FinanceData
+from PriceCache import PriceCache
+from PriceStore import PriceStore
+import Profiling as prof
+from Portfolio import SUMMARY_HEADER, ASSETS_HEADER, ANALYTICS_HEADER, SOURCES_HEADER, format_value, curr_conv
+from CurrencyConverter import CurrencyConversionError
+
+
+class ConsoleView:
+    """ View used by Controller in headless mode, it prints loading log to standard error output """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+
+    def report_loading_progress(self, load_id: int, progress_bar_percentage: float, log: str) -> None:
+        pass
+
+    def report_log_line(self, load_id: int, log: str) -> None:
+        print(f"{self._name}: {log}", file=sys.stderr)
+
+    def report_loading_done(self, load_id: int, portfolio) -> None:
+        pass
+
+    def report_reloading_done(self, load_id: int, portfolio) -> None:
+        pass
+
+    def report_quotes_updated(self, tickers: list[str]) -> None:
+        pass
+
+
+def prefetch_history_data(workbooks: list[str]) -> None:
+    """
+    Pull history data of tickers of all `workbooks` into the shared price cache and the price store, so that each ticker is downloaded
+    only once.
+    Data of each ticker are pulled from its earliest first buy in all workbooks.
+    """
+    first_buys:dict = dict()
+    for xlsx_path in workbooks:
+        loader = DataLoader()
+        try:
+            loader.read_portfolio_excel(xlsx_path)
+        except DataLoaderError as e:
+            print(f"{xlsx_path}: {e}", file=sys.stderr)
+            continue
+        for ticker in loader.get_all_tickers():
+            first_buy = loader.get_ticker_data(ticker)['info']['First buy']
+            first_buys[ticker] = min(first_buys.get(ticker, first_buy), first_buy)
+
+    finance_data = FinanceData(PriceCache(), PriceStore())
+    for ticker, error in finance_data.pull_tickers_history_data(first_buys):
+        if error is not None:
+            print(f"{ticker}: {error}", file=sys.stderr)
+    # Workers map the store, so history data are shared by all of them instead of being loaded by each worker
+    try:
+        finance_data.write_store()
+    except OSError as e:
+        print(e, file=sys.stderr)
+    prof.print_report("Phase timing report: prefetch of history data")
+
+
+def write_table(frame: pd.DataFrame, path: str, output_format: str, index: bool=False) -> None:
+    """ Write `frame` to `path` (without extension) in the given format """
+    match output_format:
+        case 'json':
+            frame.to_json(f"{path}.json", orient='table' if index else 'records', date_format='iso', indent=2)
+        case 'csv':
+            frame.to_csv(f"{path}.csv", index=index)
+        case 'parquet':
+            frame.to_parquet(f"{path}.parquet", index=index)
+        case _:
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+
+def process_workbook(task: tuple[str, str, str, str]) -> tuple[str, str|None]:
+    """
+    Compute portfolio of one workbook and write its summary table, assets table, analytics table and evolution series to the output directory.
+    task: (xlsx_path, output_dir, output_format, currency)
+    Return tuple (xlsx_path, error), `error` is `None` on success. Tables are written also when some assets failed to load,
+    but the workbook is reported as failed, because its totals are incomplete.
+    """
+    xlsx_path, output_dir, output_format, currency = task
+    try:
+        controller = ct.Controller()
+        controller.set_view(ConsoleView(xlsx_path))
+        controller.change_uniform_currency(currency)
+        if not controller.load_portfolio(xlsx_path):
+            return xlsx_path, "portfolio failed to load"
+
+        write_portfolio(controller, op.join(output_dir, op.splitext(op.basename(xlsx_path))[0]), output_format, currency)
+        failed_tickers = controller.get_failed_tickers()
+        if failed_tickers:
+            return xlsx_path, f"assets {', '.join(failed_tickers)} failed to load"
+    except Exception as e:
+        return xlsx_path, str(e)
+    finally:
+        prof.print_report(f"Phase timing report: {xlsx_path}")
+    return xlsx_path, None
+
+
+def write_portfolio(controller: ct.Controller, directory: str, output_format: str, currency: str) -> None:
+    """ Write summary table, assets table, analytics table and evolution series of the loaded portfolio to `directory` """
+    summary_data, invested, current = controller.get_summary_data()
+    summary = pd.DataFrame(summary_data, columns=SUMMARY_HEADER)
+    summary.loc[len(summary)] = ['TOTAL', format_value(invested, currency), format_value(current, currency), format_value(100, '%'), '']
+    assets = pd.DataFrame(controller.get_asset_table_data(), columns=ASSETS_HEADER)
+    analytics = pd.DataFrame(controller.get_analytics_data(), columns=ANALYTICS_HEADER)
+    tickers = ['PORTFOLIO'] + controller.get_asset_tickers()
+    evolution = pd.DataFrame({ticker: controller.get_evolution_graph(ticker) for ticker in tickers})
+    evolution.index.name = 'DATE'
+
+    makedirs(directory, exist_ok=True)
+    write_table(summary, op.join(directory, 'summary'), output_format)
+    write_table(assets, op.join(directory, 'assets'), output_format)
+    write_table(analytics, op.join(directory, 'analytics'), output_format)
+    write_table(evolution, op.join(directory, 'evolution'), output_format, index=True)
+
+
+def read_workbook(xlsx_path: str) -> tuple[str, DataLoader|None, str|None]:
+    """ Read workbook at `xlsx_path`. Return tuple (xlsx_path, loader, error), `loader` is `None` on failure """
+    loader = DataLoader()
+    try:
+        loader.read_portfolio_excel(xlsx_path)
+    except DataLoaderError as e:
+        return xlsx_path, None, str(e)
+    return xlsx_path, loader, None
+
+
+def run_batch(workbooks: list[str], output_dir: str, output_format: str='json', currency: str='EUR', jobs: int|None=None) -> int:
+    """
+    Compute portfolios of all `workbooks` in parallel processes and write results to `output_dir`.
+    Return number of workbooks which failed.
+    """
+    failed:int = 0
+    tasks = [(xlsx_path, output_dir, output_format, currency) for xlsx_path in workbooks]
+    # ECB rates are downloaded once before the workers start, forked workers inherit the loaded rates
+    try:
+        curr_conv.load()
+    except CurrencyConversionError as e:
+        print(e, file=sys.stderr)
+    # Workbooks are read only in worker processes, the main process just collects results
+    with multiprocessing.Pool(processes=jobs, initializer=prof.reset_process) as pool:
+        pool.apply(prefetch_history_data, (workbooks,))
+        for xlsx_path, error in pool.imap_unordered(process_workbook, tasks):
+            if error is None:
+                print(f"{xlsx_path}: done")
+            else:
+                failed += 1
+                print(f"{xlsx_path}: {error}", file=sys.stderr)
+    return failed
+
+
+def run_consolidated(workbooks: list[str], output_dir: str, output_format: str='json', currency: str='EUR', jobs: int|None=None) -> int:
+    """
+    Read `workbooks` in parallel processes, merge them into one portfolio (see `DataLoader.consolidate`) and write its tables,
+    evolution and breakdown of assets by workbooks (table `sources`) to subdirectory `consolidated` of `output_dir`.
+    History data and evolution of each ticker are pulled and counted once, however many workbooks hold it.
+    Return number of workbooks which failed (all of them if the portfolio failed to load). A workbook fails also when any of its assets
+    failed to load.
+    """
+    loaders:list[DataLoader] = list()
+    with multiprocessing.Pool(processes=jobs, initializer=prof.reset_process) as pool:
+        # Results are collected in order of `workbooks`, so the first workbook has priority when data are merged
+        for xlsx_path, loader, error in pool.imap(read_workbook, workbooks):
+            if error is None:
+                loaders.append(loader)
+            else:
+                print(f"{xlsx_path}: {error}", file=sys.stderr)
+    if not loaders:
+        return len(workbooks)
+
+    try:
+        controller = ct.Controller()
+        controller.set_view(ConsoleView('consolidated'))
+        controller.change_uniform_currency(currency)
+        if not controller.load_consolidated_portfolio(loaders):
+            print("consolidated: portfolio failed to load", file=sys.stderr)
+            return len(workbooks)
+
+        directory = op.join(output_dir, 'consolidated')
+        write_portfolio(controller, directory, output_format, currency)
+        write_table(pd.DataFrame(controller.get_sources_data(), columns=SOURCES_HEADER), op.join(directory, 'sources'), output_format)
+        failed_tickers = set(controller.get_failed_tickers())
+    except Exception as e:
+        print(f"consolidated: {e}", file=sys.stderr)
+        return len(workbooks)
+    finally:
+        prof.print_report("Phase timing report: consolidated portfolio")
+
+    failed:int = len(workbooks) - len(loaders)
+    for loader in loaders:
+        missing = [ticker for ticker in loader.get_all_tickers() if ticker in failed_tickers]
+        if missing:
+            failed += 1
+            print(f"{loader.get_path()}: assets {', '.join(missing)} failed to load", file=sys.stderr)
+    print("consolidated: done" if not failed_tickers else "consolidated: done with missing assets")
+    return failed
+
+
+# END OF FILE #
@@ -1,53 +1,299 @@
 
 
+import threading
+from typing import Callable
 from DataLoader import DataLoader
 from FinDataPuller import FinanceData
+from PriceCache import PriceCache
+from PriceStore import PriceStore
 from Portfolio import Portfolio
+import Snapshot as sn
+import Profiling as prof
 
 
 class Controller():
 
-    def __init__(self) -> None:
-        self._excel_data = DataLoader()
-        self._fin_data = FinanceData()
-        self._portfolio = Portfolio(self._excel_data, self._fin_data)
+    def __init__(self, evolution_workers:int=0) -> None:
+        """
+        evolution_workers: number of processes which count evolutions of assets (see `Portfolio`), 0 counts them in the loading thread
+        """
+        self._fin_data = FinanceData(PriceCache(), PriceStore())
+        self._evolution_workers:int = evolution_workers
+        self._portfolio = Portfolio(DataLoader(), self._fin_data, evolution_workers=evolution_workers)
+        self._load_id:int = 0 # identifier of the latest loading, older loadings are cancelled
+        # Portfolio is not thread-safe, its views are read by the GUI thread and the API server
+        self._portfolio_lock = threading.RLock()
+        self._change_listeners:list[Callable[[], None]] = list()
+        self._quote_refresh_stop:threading.Event|None = None # set to stop the running refresh of live prices
 
 
     def set_view(self, view) -> None:
         self._view = view
 
 
-    def load_assets_data(self, excel_path:str) -> None:
-        failed = "" # just for failed asset tickers log
+    def add_change_listener(self, listener: Callable[[], None]) -> None:
+        """ Add function which is called (from the thread which made the change) when the portfolio or its currency changes """
+        self._change_listeners.append(listener)
+
+
+    def _notify_change(self) -> None:
+        for listener in self._change_listeners:
+            listener()
+
+
+    def start_loading(self, excel_path:str) -> None:
+        """
+        Start loading of portfolio from `excel_path` in a background thread. Unfinished previous loading is cancelled.
+        Progress and result of the loading are sent to the view as window events, loaded portfolio is used after `finish_loading`.
+        """
+        self._load_id += 1
+        threading.Thread(target=self._load_portfolio, args=(self._load_id, excel_path), daemon=True).start()
+
+
+    def cancel_loading(self) -> None:
+        """ Cancel running loading. The loading thread stops after the asset which is currently processed """
+        self._load_id += 1
+
+
+    def is_current_loading(self, load_id:int) -> bool:
+        """ Return True if loading with `load_id` was not cancelled or replaced by newer loading """
+        return load_id == self._load_id
+
+
+    def finish_loading(self, load_id:int, portfolio:Portfolio|None) -> bool:
+        """
+        Replace current portfolio by the loaded one. Return False (and keep current portfolio) if loading failed, was cancelled or
+        replaced by newer loading. It has to be called from the GUI thread.
+        """
+        if portfolio is None or not self.is_current_loading(load_id):
+            return False
+        with self._portfolio_lock:
+            # Currency could be changed during the loading
+            portfolio.make_currency_conversion(self.get_current_currency())
+            # Live prices received during the loading were applied only to the previous portfolio, only the last day is updated
+            portfolio.update_live_quotes(self._fin_data.get_last_closes(portfolio.get_tickers()))
+            self._portfolio = portfolio
+        self._notify_change()
+        return True
+
+
+    def load_portfolio(self, excel_path:str) -> bool:
+        """
+        Load portfolio from `excel_path` in the calling thread (headless mode). Return False if loading failed.
+        """
+        self._load_id += 1
+        return self.finish_loading(self._load_id, self.load_assets_data(self._load_id, excel_path))
+
+
+    def restore_snapshot(self, excel_path:str|None=None) -> bool:
+        """
+        Use portfolio from the snapshot of the last loaded portfolio if it is up to date (see `Snapshot.load_snapshot`).
+        excel_path: the snapshot is used only if it was computed from this workbook, any workbook if it is `None`
+        Return False if there is no such snapshot.
+        """
+        self._load_id += 1
+        return self.finish_loading(self._load_id, sn.load_snapshot(self._fin_data, excel_path))
+
+
+    def save_snapshot(self, portfolio:Portfolio) -> None:
+        """ Save snapshot of `portfolio`, so that the next start can use it. Portfolios with missing assets are not saved """
+        if set(portfolio.get_tickers()) != set(portfolio.get_data_loader().get_all_tickers()):
+            return
+        try:
+            with self._portfolio_lock: # portfolio could be already used by the GUI thread
+                sn.save_snapshot(portfolio)
+        except Exception as e:
+            print(f"Snapshot was not saved: {e}")
+
+
+    @prof.profile_thread
+    def _load_portfolio(self, load_id:int, excel_path:str) -> None:
+        """ Loading thread """
+        # Portfolio computed from the same workbook and data is used without loading
+        portfolio = sn.load_snapshot(self._fin_data, excel_path)
+        if portfolio is not None:
+            if self.is_current_loading(load_id):
+                self._view.report_loading_done(load_id, portfolio)
+            return
+
+        portfolio = self.load_assets_data(load_id, excel_path)
+        if self.is_current_loading(load_id):
+            self._view.report_loading_done(load_id, portfolio)
+        if portfolio is not None:
+            self.save_price_store()
+            self.save_snapshot(portfolio)
+
+
+    def save_price_store(self) -> None:
+        """ Write pulled history data to the memory-mapped price store, so that other instances of the application use them """
+        try:
+            self._fin_data.write_store()
+        except OSError as e:
+            print(e)
+
+
+    def load_assets_data(self, load_id:int, excel_path:str) -> Portfolio|None:
+        """
+        Load new portfolio from `excel_path`. Return `None` if loading failed or was cancelled.
+        load_id: identifier of the loading, the loading stops when it is not the current one.
+        """
+        excel_data = DataLoader()
+        try:
+            self._view.report_loading_progress(load_id, 1, f"Loading excel file data")
+            excel_data.read_portfolio_excel(excel_path)
+        except Exception as e:
+            print(e)
+            self._view.report_loading_progress(load_id, 0, e)
+            return None
+        return self._compute_portfolio(load_id, excel_data)
+
+
+    def load_consolidated_portfolio(self, loaders:list[DataLoader]) -> bool:
+        """
+        Load portfolio merged from data of several workbooks (see `DataLoader.consolidate`) synchronously. Assets held in several
+        workbooks are constructed only once. Return True if the portfolio was loaded.
+        """
+        self._load_id += 1
+        return self.finish_loading(self._load_id, self._compute_portfolio(self._load_id, DataLoader.consolidate(loaders)))
+
+
+    def _compute_portfolio(self, load_id:int, excel_data:DataLoader) -> Portfolio|None:
+        """ Construct portfolio of loaded `excel_data`. Return `None` if the loading was cancelled """
+        portfolio = Portfolio(excel_data, self._fin_data, self.get_current_currency(), self._evolution_workers)
+        tickers:list = excel_data.get_all_tickers()
+
+        # Assets are constructed in order in which their history data are downloaded
+        if not self._construct_assets(load_id, portfolio, tickers):
+            return None
+
+        # Prepare cached views, so that the GUI thread does not compute them
+        portfolio.get_assets_data()
+        portfolio.get_evolution_data()
+        return portfolio
+
+
+    def _construct_assets(self, load_id:int, portfolio:Portfolio, tickers:list[str]) -> bool:
+        """ Construct assets of `tickers` in `portfolio` and report the progress. Return False if the loading was cancelled """
+        failed:list[str] = [] # just for failed asset tickers log
+        assets = portfolio.construct_assets(tickers)
+        for i, (asset_ticker, asset, error) in enumerate(assets):
+            if not self.is_current_loading(load_id):
+                assets.close() # cancel remaining downloads
+                return False
+            progress:float = (i+1)/len(tickers)
+            self._view.report_loading_progress(load_id, progress, f"Processing asset: {asset_ticker}")
+            if error is not None:
+                print(error)
+                self._view.report_loading_progress(load_id, progress, error)
+            if asset is None:
+                failed.append(asset_ticker)
+                self._view.report_log_line(load_id, f"Asset {', '.join(failed)} failed to load.")
+        return True
+
+
+    def is_workbook_changed(self) -> bool:
+        """ Return True if workbook of the current portfolio was changed since it was loaded """
+        return self._portfolio.get_data_loader().is_source_changed()
+
+
+    def start_reloading(self) -> None:
+        """
+        Start incremental reloading of the current portfolio workbook in a background thread. Only assets whose data were changed
+        are constructed again. The result is reported by the view as `report_reloading_done`, it is used after `finish_loading`.
+        """
+        self._load_id += 1
+        threading.Thread(target=self._reload_portfolio, args=(self._load_id,), daemon=True).start()
+
+
+    @prof.profile_thread
+    def _reload_portfolio(self, load_id:int) -> None:
+        """ Reloading thread """
+        portfolio = self.reload_assets_data(load_id)
+        if self.is_current_loading(load_id):
+            self._view.report_reloading_done(load_id, portfolio)
+        if portfolio is not None:
+            self.save_snapshot(portfolio)
+
+
+    def reload_assets_data(self, load_id:int) -> Portfolio|None:
+        """
+        Read workbook of the current portfolio again and return new portfolio which shares unchanged assets with the current one.
+        Return `None` if reading failed or the reloading was cancelled.
+        """
+        loaded_data = self._portfolio.get_data_loader()
+        excel_data = DataLoader()
         try:
-            self._view.loading_layout.update_login_log_progress_bar(1, f"Loading excel file data")
-            self._excel_data.read_portfolio_excel(excel_path)
-            tickers:list = self._excel_data.get_all_tickers()
+            excel_data.read_portfolio_excel(loaded_data.get_path())
         except Exception as e:
             print(e)
-            self._view.loading_layout.update_login_log_progress_bar(0, e)
+            self._view.report_log_line(load_id, e)
+            return None
 
-        for i, asset_ticker in enumerate(tickers):
+        changed = excel_data.get_changed_tickers(loaded_data)
+        portfolio = self._portfolio.copy_unchanged(excel_data, changed)
+        # Changed assets and assets which failed to load before
+        loaded = set(portfolio.get_tickers())
+        if not self._construct_assets(load_id, portfolio, [ticker for ticker in excel_data.get_all_tickers() if ticker not in loaded]):
+            return None
+
+        self._view.report_log_line(load_id, f"Workbook reloaded, changed assets: {', '.join(sorted(changed)) or 'none'}")
+        portfolio.get_assets_data()
+        portfolio.get_evolution_data()
+        return portfolio
+
+
+
+    def start_quote_refresh(self, interval:float) -> None:
+        """
+        Start refreshing prices of assets of the current portfolio every `interval` seconds in a background thread. Only the values
+        of today are updated (see `Portfolio.update_live_quotes`), updated tickers are reported by the view as `report_quotes_updated`.
+        """
+        self.stop_quote_refresh()
+        self._quote_refresh_stop = threading.Event()
+        threading.Thread(target=self._refresh_quotes, args=(interval, self._quote_refresh_stop), daemon=True).start()
+
+
+    def stop_quote_refresh(self) -> None:
+        if self._quote_refresh_stop is not None:
+            self._quote_refresh_stop.set()
+            self._quote_refresh_stop = None
+
+
+    def _refresh_quotes(self, interval:float, stop:threading.Event) -> None:
+        """ Refreshing thread, pulling and updating of prices are measured as phases `pull_live_quotes` and `update_live_quotes` """
+        while not stop.wait(interval):
             try:
-                progress:float = (i+1)/len(tickers)
-                self._view.loading_layout.update_login_log_progress_bar(progress, f"Processing asset: {asset_ticker}")
-                asset = self._portfolio.construct_asset(asset_ticker)
-                if asset is None:
-                    failed = failed + ", " + asset_ticker
-                    self._view.update_log_line(f"Asset {failed} failed to load.")
-                    self._view.loading_layout.update_login_log_progress_bar(progress, f"Processing asset: {asset_ticker}")
+                tickers = self.get_asset_tickers()
+                if not tickers:
+                    continue
+                updated = self.apply_live_quotes(self._fin_data.pull_live_quotes(tickers))
             except Exception as e:
-                print(e)
-                self._view.loading_layout.update_login_log_progress_bar(0, e)
-        
+                # The refresh continues with the next prices
+                print(f"Live prices were not updated: {e}")
+                continue
+            if updated and not stop.is_set():
+                self._view.report_quotes_updated(updated)
+
+
+    def apply_live_quotes(self, quotes:dict[str, float]) -> list[str]:
+        """ Use live prices `quotes` (ticker: price) as values of assets today. Return tickers whose values were changed """
+        with self._portfolio_lock:
+            updated = self._portfolio.update_live_quotes(quotes)
+        if updated:
+            self._notify_change()
+        return updated
 
 
     def reset_loaded(self) -> None:
-        self._portfolio.reset_portfolio()
+        with self._portfolio_lock:
+            self._portfolio.reset_portfolio()
+        self._notify_change()
 
 
     def change_uniform_currency(self, currency: str) -> None:
-        self._portfolio.make_currency_conversion(currency)
+        with self._portfolio_lock:
+            self._portfolio.make_currency_conversion(currency)
+        self._notify_change()
 
 
     def get_current_currency(self) -> str:
@@ -56,18 +302,40 @@ class Controller():
 
     def get_summary_data(self) -> list:
         result = []
-        result.append(self._portfolio.get_summary_data()) # index: 0
-        result.append(self._portfolio.get_total_invested()) # index: 1
-        result.append(self._portfolio.get_current_portfolio_value()) # index: 2
+        with self._portfolio_lock:
+            result.append(self._portfolio.get_summary_data()) # index: 0
+            result.append(self._portfolio.get_total_invested()) # index: 1
+            result.append(self._portfolio.get_current_portfolio_value()) # index: 2
         return result
 
 
     def get_asset_table_data(self) -> list:
-        return self._portfolio.get_assets_data()
+        with self._portfolio_lock:
+            return self._portfolio.get_assets_data()
+
+
+    def get_analytics_data(self) -> list:
+        """ Get analytics (TWR, annualized return, max drawdown, volatility) of assets and of whole portfolio (the last row) """
+        with self._portfolio_lock:
+            return self._portfolio.get_analytics_data()
+
+
+    def get_sources_data(self) -> list:
+        """ Get breakdown of assets by workbooks of the portfolio (see `Portfolio.get_sources_data`) """
+        with self._portfolio_lock:
+            return self._portfolio.get_sources_data()
 
 
     def get_asset_tickers(self) -> list[str]:
-        return self._portfolio.get_tickers()
+        with self._portfolio_lock:
+            return self._portfolio.get_tickers()
+
+
+    def get_failed_tickers(self) -> list[str]:
+        """ Return tickers of the loaded workbook whose assets failed to load (they are missing in the portfolio) """
+        with self._portfolio_lock:
+            loaded = set(self._portfolio.get_tickers())
+            return [ticker for ticker in self._portfolio.get_data_loader().get_all_tickers() if ticker not in loaded]
 
 
     def get_evolution_graph(self, ticker: str|None=None, date_from:str|None=None, date_to:str|None=None):
@@ -76,21 +344,19 @@ class Controller():
         Optional arguments are date_from and date_to (in string format 'YYYY-mm-dd') which can filter the output data.
         """
 
-        if ticker in (None, 'PORTFOLIO'):
-            graph_data = self._portfolio.get_evolution_data()
-        else:
-            graph_data = self._portfolio.get_ticker_evolution_data(ticker)
-            
-        if graph_data is None:
-            return None
+        with self._portfolio_lock:
+            if ticker in (None, 'PORTFOLIO'):
+                return self._portfolio.get_evolution_data(date_from, date_to)
+            else:
+                return self._portfolio.get_ticker_evolution_data(ticker, date_from, date_to)
+
 
-        if date_from is None and date_to is None:
-            return graph_data
-        elif date_from is None and date_to is not None:
-            return graph_data.loc[:date_to]
-        elif date_to is None and date_from is not None:
-            return graph_data.loc[date_from:]
-        else:
-            return graph_data.loc[date_from:date_to]
+    def get_evolution_aggregates(self, ticker: str|None=None, date_from:str|None=None, date_to:str|None=None, points:int=0):
+        """
+        Get aggregated evolution (last, minimal, maximal value and return of each period) of asset with given `ticker` or whole portfolio
+        in the coarsest resolution with at least `points` periods in the range.
+        """
+        with self._portfolio_lock:
+            return self._portfolio.get_evolution_aggregates(None if ticker == 'PORTFOLIO' else ticker, date_from, date_to, points)
 
 # END OF FILE #
\ No newline at end of file
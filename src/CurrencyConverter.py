@@ -2,41 +2,158 @@
 # Author: Michal Ľaš
 # Date: 17.07.2024
 
-from currency_converter import CurrencyConverter, RateNotFoundError, ECB_URL
-from datetime import date
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
 import os.path as op
-from os import remove, listdir
-import sys
+import tempfile
+import time
+from os import close, remove, replace, listdir
+import re
+import threading
+from typing import Callable
 import urllib.request
+from zipfile import ZipFile
+from AppPaths import get_data_directory
+import Profiling as prof
+
+
+# URL of history of ECB reference exchange rates
+ECB_URL:str = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist.zip"
+# Reference currency of ECB rates
+REF_CURRENCY:str = 'EUR'
+# Name of downloaded ECB files
+ECB_FILE_PATTERN:re.Pattern = re.compile(r"ecb_\d{8}\.zip")
+# Names of ECB files and their parsed tables which are deleted when they are older than the used file
+ECB_DATA_PATTERN:re.Pattern = re.compile(r"ecb_\d{8}\.(zip|npz)")
+# Temporary files of interrupted writes are deleted after this time [s] (newer ones can be still written by other processes)
+STALE_PART_AGE:float = 24 * 60 * 60
+
+
+class CurrencyConversionError(Exception):
+
+    def __init__(self, message) -> None:
+        self.message = message
+        super().__init__(message)
+
+    def __str__(self) -> str:
+        return f"CurrencyConversionError: {self.message}"
+
+
+def parse_ecb_file(zip_path: str) -> tuple[date, list[str], np.ndarray]:
+    """
+    Parse ECB history file into a table of daily rates against EUR. Return tuple (first_date, currencies, rates), where `rates` has one row
+    for each currency and one column for each day from the `first_date`. Missing rates (weekends, holidays) are filled with the last known rate,
+    dates out of currency bounds use its first/last known rate.
+    """
+    with ZipFile(zip_path) as archive, archive.open(archive.namelist()[0]) as csv:
+        frame = pd.read_csv(csv, index_col=0, parse_dates=True, na_values=['N/A', ''])
+    # ECB file has a trailing comma on each line
+    frame = frame.loc[:, [not column.startswith('Unnamed') for column in frame.columns]].dropna(axis=1, how='all')
+    frame = frame.sort_index()
+    frame = frame.reindex(pd.date_range(start=frame.index[0], end=frame.index[-1], freq='D')).ffill().bfill()
+    return frame.index[0].date(), [REF_CURRENCY] + list(frame.columns), np.vstack([np.ones(len(frame)), frame.to_numpy().T])
+
+
+def _write_file(path: str, write: Callable[[str], any]) -> None:
+    """
+    Create file at `path` by function `write`, which writes it to the given temporary path. The temporary file has a unique name and
+    it replaces `path` at once, so an interrupted write or a concurrent write of another process does not leave invalid file.
+    """
+    descriptor, temp_path = tempfile.mkstemp(dir=op.dirname(op.abspath(path)), prefix=f"{op.basename(path)}.", suffix='.part')
+    close(descriptor)
+    try:
+        write(temp_path)
+        replace(temp_path, path)
+    except BaseException:
+        if op.exists(temp_path):
+            remove(temp_path)
+        raise
 
 
 class CurrencyConversion:
 
-    
+
     def __init__(self) -> None:
-        # Get application path
-        # IMPORTANT: This assume that in the same directory as executable is a directory named `ecb_dat`
-        if getattr(sys, 'frozen', False):
-            application_path = op.dirname(sys.executable)
-        else:
-            application_path = op.dirname(op.abspath(__file__))
-        
-        directory = op.join(application_path, "ecb_data")
-        filename = f"ecb_{date.today():%Y%m%d}.zip"
-        latest = op.join(directory, filename)
-        # Delete old data ECB .zip files
-        for item in listdir(directory):
-            item_path = op.join(directory, item)
-            if op.isfile(item_path) and item_path != latest:
+        # Rates are loaded on the first use (see `_load`)
+        self._lock = threading.Lock()
+        self._first_date:pd.Timestamp|None = None # date of the first column of `_rates`
+        self._currencies:dict[str, int] = {} # currency: row in `_rates`
+        self._rates:np.ndarray|None = None # daily rates against EUR (currencies x days)
+        self._pair_rates:dict[tuple[str, str], np.ndarray] = {} # (from, to): daily conversion rates over whole ECB date range
+
+
+    @prof.timed('load_ecb_rates')
+    def load(self) -> None:
+        """
+        Load ECB rates, it is called on the first conversion (processes which share `ecb_data` can call it beforehand, so the data are
+        downloaded once). Today's data are downloaded if they are not downloaded yet. If the download fails, the newest downloaded data are used.
+        Parsed rates are stored in binary `.npz` file next to the ECB file, so they are parsed only once.
+        Files are written under unique temporary names, so several processes can load the rates at once.
+        IMPORTANT: Data are stored in directory named `ecb_data` in the same directory as executable
+        """
+        with self._lock:
+            if self._rates is not None:
+                return
+
+            directory = get_data_directory("ecb_data")
+            latest = op.join(directory, f"ecb_{date.today():%Y%m%d}.zip")
+            # Download todays data
+            if not op.isfile(latest):
                 try:
-                    remove(item_path)
+                    _write_file(latest, lambda temp_path: urllib.request.urlretrieve(ECB_URL, temp_path))
                 except Exception as e:
-                    pass
-        # Download todays data
-        if not op.isfile(latest):
-            urllib.request.urlretrieve(ECB_URL, latest)
-        # Create currency converter object
-        self._c = CurrencyConverter(latest, fallback_on_missing_rate=True, fallback_on_wrong_date=True, fallback_on_missing_rate_method='last_known')
+                    print(f"ECB data could not be downloaded, the newest downloaded data are used: {e}")
+
+            ecb_files = sorted(item for item in listdir(directory) if ECB_FILE_PATTERN.fullmatch(item))
+            if not ecb_files:
+                raise CurrencyConversionError("ECB data are not available. Data could not be downloaded and there are no previously downloaded data.")
+            newest = op.join(directory, ecb_files[-1])
+            self._load_rates(newest)
+
+            # Delete data older than the used data and temporary files left by interrupted writes
+            for item in listdir(directory):
+                item_path = op.join(directory, item)
+                try:
+                    if (ECB_DATA_PATTERN.fullmatch(item) and op.splitext(item)[0] < op.splitext(ecb_files[-1])[0]) or \
+                       (item.endswith('.part') and time.time() - op.getmtime(item_path) > STALE_PART_AGE):
+                        remove(item_path)
+                except OSError:
+                    pass # the file was already deleted by another process
+
+
+    def get_data_date(self) -> date|None:
+        """ Return date of the newest downloaded ECB data (without downloading them) or `None` if there are no data """
+        ecb_files = sorted(item for item in listdir(get_data_directory("ecb_data")) if ECB_FILE_PATTERN.fullmatch(item))
+        if not ecb_files:
+            return None
+        return datetime.strptime(ecb_files[-1], "ecb_%Y%m%d.zip").date()
+
+
+    def _get_tables_path(self, zip_path: str) -> str:
+        """ Return path of binary file with parsed rates of ECB file `zip_path` """
+        return f"{op.splitext(zip_path)[0]}.npz"
+
+
+    def _load_rates(self, zip_path: str) -> None:
+        """ Load rates from binary file of `zip_path`, the ECB file is parsed (and binary file is created) only if binary file is not valid """
+        tables_path = self._get_tables_path(zip_path)
+        try:
+            with np.load(tables_path, allow_pickle=False) as tables:
+                first_date, currencies, rates = date.fromisoformat(str(tables['first_date'])), list(tables['currencies']), tables['rates']
+            if rates.shape[0] != len(currencies):
+                raise ValueError("inconsistent rates table")
+        except Exception:
+            first_date, currencies, rates = parse_ecb_file(zip_path)
+            def save_tables(temp_path: str) -> None:
+                with open(temp_path, 'wb') as f:
+                    np.savez(f, first_date=first_date.isoformat(), currencies=np.array(currencies), rates=rates)
+            _write_file(tables_path, save_tables)
+
+        self._pair_rates = {}
+        self._first_date = pd.Timestamp(first_date)
+        self._currencies = {str(currency): row for row, currency in enumerate(currencies)}
+        self._rates = rates
 
 
     def convert_usd_to_eur(self, amount:float|int, date:date|None=None) -> float:
@@ -44,28 +161,61 @@ class CurrencyConversion:
         Convert USD to EUR. If `date` parameter is None then is used most recent date.
         """
         return self.convert_to_eur(amount, 'USD', date)
-        
+
 
     def convert_to_eur(self, amount: float|int, from_currency: str, date: date|None=None) -> float:
         """
         Convert to EUR from specified currency. If `date` parameter is None then is used most recent date.
         """
         return self.convert(amount, from_currency, 'EUR', date)
-    
+
 
     def convert(self, amount: float|int, from_currency: str, to_currency: str, date: date|None=None) -> float:
         """
         Convert choosen currency to different currency. If `date` parameter is None then is used most recent date.
         """
-        conversion: float = 0
+        rates = self._get_pair_rates(from_currency, to_currency)
 
         if date is None:
             # Use the most recent conversion rate
-            conversion = self._c.convert(amount, from_currency, to_currency)
+            return amount * rates[-1]
         else:
-            conversion = self._c.convert(amount, from_currency, to_currency, date=date)
-    
-        return conversion
-    
+            position = np.clip((pd.Timestamp(date).normalize() - self._first_date).days, 0, len(rates) - 1)
+            return amount * rates[position]
+
+
+    def _get_daily_rates(self, currency: str) -> np.ndarray:
+        """
+        Return daily rates of `currency` against EUR for every day of the ECB data range. Days out of the `currency` bounds
+        use the first/last known rate.
+        """
+        if self._rates is None:
+            self.load()
+
+        if currency not in self._currencies:
+            raise ValueError(f"{currency} is not a supported currency")
+
+        return self._rates[self._currencies[currency]]
+
+
+    def _get_pair_rates(self, from_currency: str, to_currency: str) -> np.ndarray:
+        """ Return daily conversion rates from `from_currency` to `to_currency` for every day of the ECB data range """
+        key = (from_currency, to_currency)
+        if key not in self._pair_rates:
+            self._pair_rates[key] = self._get_daily_rates(to_currency) / self._get_daily_rates(from_currency)
+        return self._pair_rates[key]
+
+
+    @prof.timed('get_conversion_rates', key_arg=2)
+    def get_conversion_rates(self, from_currency: str, to_currency: str, index: pd.DatetimeIndex) -> np.ndarray:
+        """
+        Return conversion rates from `from_currency` to `to_currency` for each date in the `index`. The rates give the same values
+        as calling `convert` with a date for every single day.
+        """
+        rates = self._get_pair_rates(from_currency, to_currency)
+        # Dates out of ECB data range fall back to the first/last rate
+        positions = np.clip((index - self._first_date).days, 0, len(rates) - 1)
+        return rates[positions]
+
 
-# END OF FILE #
\ No newline at end of file
+# END OF FILE #
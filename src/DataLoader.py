@@ -4,31 +4,57 @@
 
 from typing import Any, Dict, Generator
 
+import hashlib
+from os import stat
+
 from openpyxl import load_workbook
-from openpyxl.worksheet.table import Table 
-from openpyxl.worksheet.worksheet import Worksheet
-from openpyxl.utils import rows_from_range
+from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+from openpyxl.utils import range_boundaries
 from collections import defaultdict
+from zipfile import ZipFile
+from xml.etree import ElementTree
+import Profiling as prof
 
 
 TableRow = Dict[str, Any]
+# Content type of table parts in .xlsx package
+TABLE_CONTENT_TYPE:str = "application/vnd.openxmlformats-officedocument.spreadsheetml.table+xml"
+
+
+def read_table_refs(xlsx_path:str) -> dict[str, str]:
+    """
+    Return cell ranges of all tables in .xlsx file by table names (e.g. {'rec_tab': 'B2:L42'}).
+    Read-only worksheets do not load tables, so they are read directly from the table parts of the file.
+    """
+    with ZipFile(xlsx_path) as archive:
+        content_types = ElementTree.fromstring(archive.read('[Content_Types].xml'))
+        parts = [item.get('PartName').lstrip('/') for item in content_types if item.get('ContentType') == TABLE_CONTENT_TYPE]
+        tables = [ElementTree.fromstring(archive.read(part)) for part in parts]
+    return {table.get('name'): table.get('ref') for table in tables}
 
 
-def iter_table_rows(ws:Worksheet, tb:Table) -> Generator[TableRow, None, None]:
+def get_file_state(path:str) -> tuple[tuple[int, int], str]:
+    """ Return tuple ((modification time, size), content hash) of file on the `path` """
+    file_stat = stat(path)
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            file_hash.update(chunk)
+    return (file_stat.st_mtime_ns, file_stat.st_size), file_hash.hexdigest()
+
+
+def iter_table_rows(ws:ReadOnlyWorksheet, ref:str) -> Generator[TableRow, None, None]:
     """ 
     Iterate over rows from a table with headers (row as dictionary)
-    Code from Stack Overflow: https://stackoverflow.com/questions/65895165/how-to-iterate-over-all-rows-in-an-excel-table-using-openpyxl
-    Author:  Jean-Francois T.
-    Date:  Jan 26, 2021 
+    ws: worksheet with the table
+    ref: cell range of the table (including headers)
     """
-    def get_row_values(ws:Worksheet,row_cell_ref:tuple):
-        return [ws[c].value for c in row_cell_ref]
+    min_col, min_row, max_col, max_row = range_boundaries(ref)
+    iter_rows = ws.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True)
+    headers = next(iter_rows)
 
-    iter_rows = rows_from_range(tb.ref)
-    headers = get_row_values(ws,next(iter_rows))
-
-    for row_cells in iter_rows:
-        yield {h:v for h,v in zip(headers, get_row_values(ws,row_cells))}
+    for row_values in iter_rows:
+        yield {h:v for h,v in zip(headers, row_values)}
 
 
 
@@ -46,46 +72,47 @@ class DataLoaderError(Exception):
 class DataLoader:
     """ Load data from .xlsx file and process necessary values """
 
-    _rec_data = defaultdict(list) # dictionary of assets names and list of its records
-    _assets_data = defaultdict(TableRow) # dictionary of assets names and the info about asset
-    _category_data = defaultdict(float)
-    _results_data = defaultdict(TableRow) # dictionary of assets names and the performance of assets
-
     def __init__(self) -> None:
-        pass
+        # Each instance holds data of its own workbook
+        self._rec_data:defaultdict[str, list[TableRow]] = defaultdict(list) # dictionary of assets names and list of its records
+        self._assets_data:defaultdict[str, TableRow] = defaultdict(dict) # dictionary of assets names and the info about asset
+        self._category_data:defaultdict[str, float] = defaultdict(float)
+        self._results_data:defaultdict[str, TableRow] = defaultdict(dict) # dictionary of assets names and the performance of assets
+        self._xlsx_path:str|None = None
+        self._xlsx_stat:tuple[int, int]|None = None # (modification time, size) of the loaded file
+        self._xlsx_hash:str|None = None # content hash of the loaded file
+        self._checked_state:tuple[tuple[int, int], str]|None = None # (stat, hash) of the file when it was last checked as changed
+        self._sources:dict[str, dict[str, TableRow]] = dict() # results of assets of each merged workbook (see `consolidate`)
 
 
     def _read_rec_data(self, record_sheet_name='Records', record_table_name='rec_tab') -> None:
         """ Read records data from .xlsx """
         ws = self._wb[record_sheet_name]
-        rec_tb = ws.tables[record_table_name]
-        for row in iter_table_rows(ws, rec_tb):
+        for row in iter_table_rows(ws, self._table_refs[record_table_name]):
             self._rec_data[row['TICKER']].append(row)
 
 
     def _read_assets_data(self, assets_sheet_name='Assets', assets_table_name='tic_tab') -> None:
         """ Read assets data from .xlsx """
         ws = self._wb[assets_sheet_name]
-        assets_tb = ws.tables[assets_table_name]
-        for row in iter_table_rows(ws, assets_tb):
+        for row in iter_table_rows(ws, self._table_refs[assets_table_name]):
             self._assets_data[row['TICKER']] = row
 
 
     def _read_category_data(self, category_sheet_name='Assets', category_table_name='category_tab') -> None:
         ws = self._wb[category_sheet_name]
-        category_tb = ws.tables[category_table_name]
-        for row in iter_table_rows(ws, category_tb):
+        for row in iter_table_rows(ws, self._table_refs[category_table_name]):
             self._category_data[row['Category']] = row['Goal']
 
 
     def _read_results_data(self, results_sheet_name='Results', results_table_name='results_tab') -> None:
         """ Read results data from .xlsx """
         ws = self._wb[results_sheet_name]
-        results_tb = ws.tables[results_table_name]
-        for row in iter_table_rows(ws, results_tb):
+        for row in iter_table_rows(ws, self._table_refs[results_table_name]):
             self._results_data[row['TICKER']] = row
 
 
+    @prof.timed('read_portfolio_excel')
     def read_portfolio_excel(self, xlsx_path:str) -> None:
         """
         Read the given excel file with portfolio data.
@@ -93,17 +120,112 @@ class DataLoader:
         self._xlsx_path = xlsx_path
 
         try:
-            self._wb = load_workbook(self._xlsx_path, data_only=True)
-            self._read_rec_data()
-            self._read_assets_data()
-            self._read_results_data()
-            self._read_category_data()
+            # State of the file is taken before reading, so changes made during reading are detected later
+            self._xlsx_stat, self._xlsx_hash = get_file_state(self._xlsx_path)
+            # Read-only workbook streams rows instead of building the whole workbook in memory
+            self._table_refs = read_table_refs(self._xlsx_path)
+            self._wb = load_workbook(self._xlsx_path, read_only=True, data_only=True)
+            try:
+                self._read_rec_data()
+                self._read_assets_data()
+                self._read_results_data()
+                self._read_category_data()
+            finally:
+                # The closed workbook is not kept, so the loader can be pickled with the portfolio
+                self._wb.close()
+                del self._wb
         except FileNotFoundError as e:
             raise DataLoaderError(f"Invalid filepath: {self._xlsx_path}. {e}")
         except Exception as e:
             raise DataLoaderError(f"Error while loading MS Excel portfolio file: {e}")
             
 
+    @classmethod
+    def consolidate(cls, loaders: list['DataLoader']) -> 'DataLoader':
+        """
+        Return DataLoader with data of all `loaders` merged as one portfolio. Records of a ticker held in several workbooks are joined,
+        so each ticker is one asset. Info of the asset is taken from the first workbook (except the earliest first buy), invested money
+        and owned shares are summed and the average buy value is weighted by owned shares. Goal of a category is taken from the first
+        workbook which has it. Results of each workbook are kept as its breakdown (see `get_source_results`).
+        The consolidated data have no source file, so they are never considered as changed.
+        """
+        merged = cls()
+        for loader in loaders:
+            for ticker, records in loader._rec_data.items():
+                merged._rec_data[ticker].extend(records)
+            for ticker, info in loader._assets_data.items():
+                if ticker not in merged._assets_data:
+                    merged._assets_data[ticker] = dict(info)
+                elif info['First buy'] is not None:
+                    # The first buy is missing for assets without buys
+                    first_buy = merged._assets_data[ticker]['First buy']
+                    if first_buy is None or info['First buy'] < first_buy:
+                        merged._assets_data[ticker]['First buy'] = info['First buy']
+            for category, goal in loader._category_data.items():
+                merged._category_data.setdefault(category, goal)
+            for source, results in loader.get_source_results().items():
+                merged._sources[source] = results
+
+        for ticker in merged._assets_data:
+            rows = [results[ticker] for results in merged._sources.values() if ticker in results]
+            invested = sum(row['INVESTED'] or 0 for row in rows)
+            owned = sum(row['OWNED'] or 0 for row in rows)
+            bought = sum((row['Average buy value'] or 0) * (row['OWNED'] or 0) for row in rows)
+            merged._results_data[ticker] = {'TICKER': ticker, 'INVESTED': invested, 'Average buy value': bought / owned if owned else 0.0,
+                                            'OWNED': owned}
+        return merged
+
+
+    def get_source_results(self) -> dict[str, dict[str, TableRow]]:
+        """ Return results of assets (dictionary of tickers and results) of each loaded workbook by its path """
+        if self._sources:
+            return self._sources
+        return {self._xlsx_path: self._results_data}
+
+
+    def get_path(self) -> str|None:
+        """ Return path of the loaded file """
+        return self._xlsx_path
+
+
+    def get_file_hash(self) -> str|None:
+        """ Return content hash of the loaded file at the time it was read """
+        return self._xlsx_hash
+
+
+    def is_source_changed(self) -> bool:
+        """
+        Return True if the loaded file was changed since it was read. Content of the file is hashed only when its modification time
+        or size differs, so a file which was only saved again (without changes) is not considered as changed.
+        The state of the loaded file is kept, so the file is reported as changed until its new data are loaded (also when
+        the reloading failed or was cancelled); the last checked state only avoids hashing of the same file again.
+        """
+        if self._xlsx_path is None:
+            return False
+        try:
+            file_stat = stat(self._xlsx_path)
+        except OSError:
+            return False # file is being replaced or it was removed, the loaded data are kept
+        file_key = (file_stat.st_mtime_ns, file_stat.st_size)
+        if file_key == self._xlsx_stat:
+            return False
+        if self._checked_state is None or self._checked_state[0] != file_key:
+            try:
+                self._checked_state = get_file_state(self._xlsx_path)
+            except OSError:
+                return False
+        return self._checked_state[1] != self._xlsx_hash
+
+
+    def get_changed_tickers(self, other: 'DataLoader') -> set[str]:
+        """
+        Return tickers whose data (records, info or results) differ from data loaded by `other` DataLoader,
+        including tickers which are loaded only by one of them.
+        """
+        tickers = self._assets_data.keys() | other._assets_data.keys()
+        return {ticker for ticker in tickers if self.get_ticker_data(ticker) != other.get_ticker_data(ticker)}
+
+
     def get_ticker_data(self, ticker: str) -> dict|None:
         """
         Return data from .xlsx file by ticker in dictionary format:
@@ -0,0 +1,80 @@
+##
+# Date: 17.10.2026
+
+from typing import Callable, NamedTuple
+import Profiling as prof
+
+
+# Inputs of derived views: uniform currency, set (and order) of assets, price data and records of the workbook
+CURRENCY:str = 'currency'
+ASSETS:str = 'assets'
+PRICES:str = 'prices'
+RECORDS:str = 'records'
+INPUTS:tuple = (CURRENCY, ASSETS, PRICES, RECORDS)
+
+
+class ViewStatistics(NamedTuple):
+    hits: int
+    misses: int
+
+
+class _View:
+    """ Cached value of one derived view and versions of its inputs at the time it was computed """
+
+    __slots__ = ('compute', 'inputs', 'versions', 'value', 'hits', 'misses')
+
+    def __init__(self, compute: Callable[[], any], inputs: tuple[str, ...]) -> None:
+        self.compute = compute
+        self.inputs = inputs
+        self.versions:tuple[int, ...]|None = None
+        self.value = None
+        self.hits:int = 0
+        self.misses:int = 0
+
+
+class DerivedViews:
+    """
+    Views derived from inputs (see `INPUTS`). Each view declares inputs it depends on and it is computed again only when a version
+    of one of them was changed by `invalidate`. Hits and misses of views are counted (and measured as profiling phases 'view <name>').
+    """
+
+    def __init__(self) -> None:
+        self._versions:dict[str, int] = {name: 0 for name in INPUTS}
+        self._views:dict[str, _View] = dict()
+
+
+    def declare(self, name: str, inputs: tuple[str, ...], compute: Callable[[], any]) -> None:
+        """ Declare view `name` computed by `compute` from `inputs` """
+        if not set(inputs) <= self._versions.keys():
+            raise ValueError(f"Unknown inputs of view {name}: {', '.join(set(inputs) - self._versions.keys())}")
+        self._views[name] = _View(compute, inputs)
+
+
+    def get(self, name: str) -> any:
+        """ Return value of view `name`, it is computed if some of its inputs changed since the last computation """
+        view = self._views[name]
+        versions = tuple(self._versions[i] for i in view.inputs)
+        if view.versions == versions:
+            view.hits += 1
+            with prof.span(f"view {name}", 'hit'):
+                return view.value
+
+        view.misses += 1
+        with prof.span(f"view {name}", 'miss'):
+            view.value = view.compute()
+        view.versions = versions
+        return view.value
+
+
+    def invalidate(self, *inputs: str) -> None:
+        """ Mark `inputs` as changed, views which depend on them are computed again when they are needed """
+        for name in inputs:
+            self._versions[name] += 1
+
+
+    def get_statistics(self) -> dict[str, ViewStatistics]:
+        """ Return hits and misses of each view """
+        return {name: ViewStatistics(view.hits, view.misses) for name, view in self._views.items()}
+
+
+# END OF FILE #
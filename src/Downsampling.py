@@ -0,0 +1,37 @@
+##
+# Date: 17.10.2026
+
+import numpy as np
+import pandas as pd
+
+
+def downsample_min_max(values: pd.Series, buckets: int) -> pd.Series:
+    """
+    Downsample `values` for a line plot `buckets` pixels wide. Values are split into `buckets` parts of the same length and only
+    the first, minimal, maximal and last value of each part are kept (at most 4 values per bucket), so the plotted line looks
+    the same as the line of all values. Series which are short enough are returned unchanged.
+    """
+    count = len(values)
+    buckets = max(1, int(buckets))
+    if count <= 4 * buckets:
+        return values
+
+    array = values.to_numpy(dtype=float)
+    starts = np.linspace(0, count, buckets + 1).astype(np.intp)[:-1]
+    bucket_ids = np.repeat(np.arange(buckets), np.diff(np.append(starts, count)))
+    ends = np.append(starts[1:], count) - 1
+
+    with np.errstate(invalid='ignore'):
+        minimums = np.fmin.reduceat(array, starts)
+        maximums = np.fmax.reduceat(array, starts)
+    # First position of minimum and maximum in each bucket (buckets with only NaN values have none)
+    min_positions = np.flatnonzero(array == minimums[bucket_ids])
+    max_positions = np.flatnonzero(array == maximums[bucket_ids])
+    min_positions = min_positions[np.unique(bucket_ids[min_positions], return_index=True)[1]]
+    max_positions = max_positions[np.unique(bucket_ids[max_positions], return_index=True)[1]]
+
+    positions = np.unique(np.concatenate([starts, ends, min_positions, max_positions]))
+    return values.iloc[positions]
+
+
+# END OF FILE #
@@ -4,11 +4,20 @@
 
 import yfinance as yf
 import pandas as pd
+import numpy as np
 from datetime import datetime, date
+from typing import Generator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PriceCache import PriceCache
+from PriceStore import PriceStore, StoredPrices, to_day_number, get_default_path
+from PriceHistory import PriceHistory
+import Profiling as prof
 
 
 # Global variable for today timedate
 today:datetime = datetime.now().date()
+# Maximal number of tickers downloaded at once
+MAX_DOWNLOAD_WORKERS:int = 8
 
 
 class FinanceDataError(Exception):
@@ -23,56 +32,205 @@ class FinanceDataError(Exception):
 
 class FinanceData:
     
-    def __init__(self) -> None:
-        self._adfs:dict[str, pd.DataFrame] = {} # assets data frames
+    def __init__(self, cache: PriceCache|None=None, store: PriceStore|None=None) -> None:
+        """
+        cache: persistent cache of pulled history data. If it is `None`, all data are always downloaded.
+        store: memory-mapped store of history data, data of tickers pulled today are used from it without copying
+        """
+        self._histories:dict[str, PriceHistory] = {} # history data of tickers (trading days only)
+        self._cache:PriceCache|None = cache
+        self._store:PriceStore|None = store
         
 
+    @prof.timed('pull_ticker_history_data', key_arg=1)
     def pull_ticker_history_data(self, ticker: str, date_from: date) -> None:
         """ 
         Pull history data of one ticker
         ticker: Asset ticker
         date_from: date from which data will be pulled. 
         """
-        if ticker not in self._adfs:
-            date_range = pd.date_range(start=date_from, end=today, freq='D')
-            asset_values = yf.Ticker(ticker).history(start=date_from, end=today, raise_errors=True).Close
-            # Remove timezone information
-            asset_values.index = asset_values.index.tz_convert(None).normalize()
-            # Fill gaps in dates and fill in forwared mode
-            self._adfs[ticker] = asset_values.reindex(date_range, method='ffill', copy=False).bfill()
+        # Data are pulled again if they do not cover the `date_from` (e.g. first buy was moved back in the workbook)
+        first_day = pd.Timestamp(date_from).normalize()
+        if ticker not in self._histories or self._histories[ticker].first_day > first_day:
+            history = self._get_stored_history(ticker, first_day)
+            if history is not None:
+                self._histories[ticker] = history
+                return
+
+            asset_values = self._pull_close_values(ticker, first_day.date()).dropna()
+            if asset_values.empty:
+                raise FinanceDataError(f"{ticker}: there are no close values")
+            # Only trading days are kept, the last close before `first_day` is valid on the first day
+            asset_values = asset_values.iloc[max(asset_values.index.searchsorted(first_day, side='right') - 1, 0):]
+            offsets = np.maximum((asset_values.index - first_day).days.to_numpy(), 0)
+            # Offsets fit in 16 bits for histories shorter than 179 years
+            offsets = offsets.astype(np.uint16 if offsets[-1] < 2**16 else np.int32)
+            self._histories[ticker] = PriceHistory(first_day, pd.Timestamp(today), offsets, asset_values.to_numpy(dtype=np.float32),
+                                                   float(asset_values.iloc[-1]))
+
+
+    def _get_stored_history(self, ticker: str, first_day: pd.Timestamp) -> PriceHistory|None:
+        """ Return history of ticker from the store if it was pulled today and it covers `first_day`, otherwise return `None` """
+        stored = self._store.get(ticker) if self._store is not None else None
+        if stored is None or stored.pulled < today or pd.Timestamp(stored.date_from) > first_day:
+            return None
+        # Arrays are sliced from the last close before `first_day`, they are not copied
+        first_offset = to_day_number(first_day.date())
+        position = max(int(np.searchsorted(stored.days, first_offset, side='right')) - 1, 0)
+        return PriceHistory(first_day, pd.Timestamp(today), stored.days[position:], stored.closes[position:], stored.last_close, first_offset)
+
+
+    def write_store(self, path: str|None=None) -> None:
+        """
+        Write histories of all pulled tickers to a new version of memory-mapped store at `path` (default is path of the store given
+        to the constructor), so that other processes can use them. Tickers of the current store which were pulled today are kept.
+        """
+        if path is None:
+            path = self._store.get_path() if self._store is not None else get_default_path()
+        prices:dict[str, StoredPrices] = dict()
+        if self._store is not None:
+            for ticker in self._store.get_tickers():
+                stored = self._store.get(ticker)
+                if stored.pulled >= today:
+                    prices[ticker] = stored
+        for ticker, history in self._histories.items():
+            days = history.offsets.astype(np.int32) - history.first_offset + to_day_number(history.first_day.date())
+            prices[ticker] = StoredPrices(history.first_day.date(), history.last_day.date(), days, history.closes, history.last_close)
+        PriceStore.write(path, prices)
+
+
+    def _download_close_values(self, ticker: str, date_from: date) -> pd.Series:
+        """ Download close values of ticker from `date_from` until yesterday """
+        asset_values = yf.Ticker(ticker).history(start=date_from, end=today, raise_errors=True).Close
+        # Remove timezone information
+        asset_values.index = asset_values.index.tz_convert(None).normalize()
+        # Days without close value are dropped before they are cached, the last close before them stays valid
+        return asset_values.dropna()
+
+
+    def _download_live_quote(self, ticker: str) -> float:
+        """ Download the latest price of ticker """
+        return float(yf.Ticker(ticker).fast_info['lastPrice'])
+
+
+    def _pull_close_values(self, ticker: str, date_from: date) -> pd.Series:
+        """
+        Return close values of ticker from `date_from`. When the cache is used, only values after the last cached close are downloaded.
+        """
+        if self._cache is None:
+            return self._download_close_values(ticker, date_from)
 
+        cached = self._cache.load(ticker)
+        if cached is None or date_from < cached[0] or cached[2].empty:
+            asset_values = self._download_close_values(ticker, date_from)
+            self._cache.store(ticker, date_from, today, asset_values, replace=True)
+            return asset_values
 
-    def pull_tickers_history_data(self, assets_tickers: list[str], date_from: str) -> None:
+        cached_from, pulled, asset_values = cached
+        if pulled >= today:
+            return asset_values
+
+        # The last cached close is downloaded again to check that history was not adjusted since (split, dividend)
+        last_close = asset_values.index[-1]
+        try:
+            new_values = self._download_close_values(ticker, last_close.date())
+        except Exception:
+            # No new data (e.g. closed market) or data are unavailable, use cached data
+            return asset_values
+
+        if last_close in new_values.index and not np.isclose(new_values[last_close], asset_values[last_close]):
+            asset_values = self._download_close_values(ticker, cached_from)
+            self._cache.store(ticker, cached_from, today, asset_values, replace=True)
+            return asset_values
+
+        self._cache.store(ticker, cached_from, today, new_values)
+        return pd.concat([asset_values, new_values[new_values.index > last_close]])
+
+
+    def pull_tickers_history_data(self, tickers_dates: dict[str, date], max_workers: int=MAX_DOWNLOAD_WORKERS) -> Generator[tuple[str, Exception|None], None, None]:
         """ 
-        This function will pull many ticker history data at once. The disadvantage is that all thicker data 
-        Will be from the same date.
-        assets_ticker: list of assets that data will be pulled.
-        date_from: date from which data will be pulled (in format 'YYYY-mm-dd').
+        This function will pull many ticker history data at once. Data are downloaded concurrently by at most `max_workers` threads.
+        tickers_dates: dictionary of asset tickers and dates from which their data will be pulled.
+        max_workers: maximal number of concurrent downloads.
+
+        Yields tuple (ticker, error) as soon as the data of the ticker are pulled, `error` is `None` on success. Failure of one ticker
+        does not cancel pulling of others. Closing the generator cancels downloads which have not started yet.
         """
-        for ticker in assets_tickers:
-            self.pull_ticker_history_data(ticker, date_from)
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {executor.submit(self.pull_ticker_history_data, ticker, date_from): ticker for ticker, date_from in tickers_dates.items()}
+            for future in as_completed(futures):
+                yield futures[future], future.exception()
+        finally:
+            # If the generator is closed before all data are pulled, waiting downloads are cancelled
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+    @prof.timed('pull_live_quotes')
+    def pull_live_quotes(self, tickers: list[str], max_workers: int=MAX_DOWNLOAD_WORKERS) -> dict[str, float]:
+        """
+        Return the latest prices of `tickers` (during trading hours the live price, otherwise the last close). Prices are downloaded
+        concurrently by at most `max_workers` threads, tickers whose price is not available are left out.
+        """
+        quotes:dict[str, float] = dict()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self._download_live_quote, ticker): ticker for ticker in tickers}
+            for future in as_completed(futures):
+                try:
+                    quotes[futures[future]] = future.result()
+                except Exception as e:
+                    print(f"{futures[future]}: live price is not available: {e}")
+        return quotes
+
+
+    def get_history_prices(self, ticker:str) -> PriceHistory:
+        """
+        Return history of the ticker with close values of trading days. The arrays are shared, they must not be modified.
+
+        IMPORTANT: data of specified ticker has to be pulled first before calling this function! otherwise it throws Exception.
+        """
+        if ticker not in self._histories:
+            raise FinanceDataError('get_history_prices: missing ticker symbol. Data has to be pulled first!')
+        return self._histories[ticker]
+
+
+    def set_last_close(self, ticker: str, close: float) -> None:
+        """
+        Set value of `ticker` on the last day of its history (e.g. live price of today), close values of trading days are not changed.
+        Tickers which were not pulled are ignored (e.g. assets of a portfolio restored from a snapshot).
+        """
+        if ticker in self._histories:
+            self._histories[ticker] = self._histories[ticker]._replace(last_close=close)
+
+
+    def get_last_closes(self, tickers: list[str]) -> dict[str, float]:
+        """ Return the last close values (they can be live prices) of pulled `tickers` """
+        return {ticker: self._histories[ticker].last_close for ticker in tickers if ticker in self._histories}
 
 
-    def get_history_data(self, ticker:str, date_from:str|None=None, date_to:str|None=None) -> pd.DataFrame:
+    def get_history_data(self, ticker:str, date_from:str|None=None, date_to:str|None=None) -> pd.Series:
         """
-        Get date in tpye 'pandas.core.series.Series' (Date, value). Some day may missing because market was closed that day!
+        Get date in tpye 'pandas.core.series.Series' (Date, value) with float32 values. Some day may missing because market was closed that day!
         Required argements is ticker which specifie the specific asset.
         Optional arguments are date_from and date_to (in string format 'YYYY-mm-dd') which can filter the output data.
 
         IMPORTANT: data of specified ticker has to be pulled first before calling this function! otherwise it throws Exception.
         """
 
-        if ticker not in self._adfs:
+        if ticker not in self._histories:
             raise FinanceDataError('get_history_data: missing ticker symbol. Data has to be pulled first!')
 
+        history = self._histories[ticker]
+        offsets = np.maximum(history.offsets.astype(np.intp) - history.first_offset, 0)
+        history_data = pd.Series(history.closes, index=history.first_day + pd.to_timedelta(offsets, unit='D'), copy=False)
         if date_from is None and date_to is None:
-            return self._adfs[ticker]
+            return history_data
         elif date_from is None and date_to is not None:
-            return self._adfs[ticker].loc[:date_to]
+            return history_data.loc[:date_to]
         elif date_to is None and date_from is not None:
-            return self._adfs[ticker].loc[date_from:]
+            return history_data.loc[date_from:]
         else:
-            return self._adfs[ticker].loc[date_from:date_to]
+            return history_data.loc[date_from:date_to]
             
 
 # END OF FILE #
\ No newline at end of file
@@ -0,0 +1,120 @@
+##
+# Date: 17.10.2026
+
+import numpy as np
+import pandas as pd
+from typing import TYPE_CHECKING
+from PriceHistory import PriceHistory
+
+if TYPE_CHECKING:
+    # Only for annotations, worker processes of `SharedEvolution` do not import openpyxl
+    from DataLoader import TableRow
+
+
+# Records packed to columns: buy date, sell date (NaT if the record is not sold), amount of shares and money paid for the buy
+# and received for the sell in currency of the asset (NaN if it is not known)
+RECORD_DTYPE:np.dtype = np.dtype([('buy', 'datetime64[s]'), ('sell', 'datetime64[s]'), ('amount', 'f8'), ('buy_value', 'f8'), ('sell_value', 'f8')])
+ONE_DAY:np.timedelta64 = np.timedelta64(1, 'D')
+
+
+def _get_record_value(record: 'TableRow', total_column: str, price_column: str) -> float:
+    """ Return total value of a buy or sell of the `record`, it is counted from the price if the total is missing """
+    if record[total_column] is not None:
+        return record[total_column]
+    if record[price_column] is not None and record['Amount'] is not None:
+        return record['Amount'] * record[price_column]
+    return np.nan
+
+
+def pack_records(records: list['TableRow']) -> np.ndarray:
+    """ Return `records` (as in DataLoader) packed to columns of `RECORD_DTYPE` """
+    return np.array([(r['Buy Date'], r['Sell Date'], r['Amount'], _get_record_value(r, 'Buy for', 'Buy price'),
+                      _get_record_value(r, 'Sell for', 'Sell price') if r['Sell Date'] is not None else np.nan) for r in records],
+                    dtype=RECORD_DTYPE)
+
+
+def get_record_positions(records: np.ndarray, first_day: pd.Timestamp|np.ndarray, days: int|np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return positions of the first day on which each record is owned (buy) and the first day on which it is not owned (sell) in `days` days
+    from `first_day`. Positions are clipped to range [0, days], records without sell date have sell position `days`.
+
+    records: records packed by `pack_records`
+    first_day, days: one range for all records or arrays with range of each record
+    """
+    first = np.asarray(first_day, dtype='datetime64[s]')
+    buy_positions = np.clip(np.ceil((records['buy'] - first) / ONE_DAY), 0, days).astype(np.intp)
+    sell_positions = np.clip(np.floor((records['sell'] - first) / ONE_DAY) + 1, 0, days)
+    sell_positions = np.where(np.isnat(records['sell']), days, sell_positions).astype(np.intp)
+    return buy_positions, sell_positions
+
+
+def count_owned_shares(records: np.ndarray, first_day: pd.Timestamp, days: int) -> np.ndarray:
+    """
+    Count owned shares for every of `days` days from `first_day`. Holdings are counted as a step function: each record adds its amount
+    on its buy date and removes it on the day after its sell date (records without sell date are owned until the last day),
+    then the changes are cumulatively summed.
+
+    records: records packed by `pack_records`
+    """
+    buy_positions, sell_positions = get_record_positions(records, first_day, days)
+
+    # There is one extra day for removing shares sold on the last day
+    deltas = np.zeros(days + 1)
+    np.add.at(deltas, buy_positions, records['amount'])
+    np.add.at(deltas, sell_positions, -records['amount'])
+
+    return np.cumsum(deltas[:-1])
+
+
+def count_owned_shares_matrix(records: list[np.ndarray], first_days: list[pd.Timestamp], days: list[int], starts: list[int],
+                              columns: int) -> np.ndarray:
+    """
+    Count owned shares of several assets in one pass over their records. Return matrix with a row for each asset and `columns` days,
+    row of asset i has the values of `count_owned_shares(records[i], first_days[i], days[i])` at columns [starts[i], starts[i] + days[i])
+    and zeros elsewhere.
+
+    records: records of each asset packed by `pack_records`
+    """
+    counts = [len(asset_records) for asset_records in records]
+    packed = np.concatenate(records)
+    rows = np.repeat(np.arange(len(records)), counts)
+    offsets = np.repeat(np.asarray(starts, dtype=np.intp), counts)
+    buy_positions, sell_positions = get_record_positions(packed, np.repeat(np.array(first_days, dtype='datetime64[s]'), counts),
+                                                         np.repeat(np.asarray(days), counts))
+
+    # Positions are clipped to the range of the asset, so its row is zero after the range
+    deltas = np.zeros((len(records), columns + 1))
+    np.add.at(deltas, (rows, buy_positions + offsets), packed['amount'])
+    np.add.at(deltas, (rows, sell_positions + offsets), -packed['amount'])
+
+    return np.cumsum(deltas[:, :-1], axis=1)
+
+
+def count_value_evolution(records: np.ndarray, history: PriceHistory, multiply: float, owned_shares: np.ndarray|None=None) -> np.ndarray:
+    """
+    Count value of owned shares in currency of the asset for each day of its `history`. Closes are forward filled to calendar days,
+    the last day is valued by the exact last close of the history (it can be a live price).
+
+    records: records packed by `pack_records`
+    multiply: number of shares per unit of the close value
+    owned_shares: shares owned on each day of the history if they were already counted (see `count_owned_shares_matrix`)
+    """
+    if owned_shares is None:
+        owned_shares = count_owned_shares(records, history.first_day, history.get_days())
+    evolution = owned_shares / multiply * history.get_daily_closes()
+    evolution[-1] = owned_shares[-1] / multiply * history.last_close
+    return evolution
+
+
+def get_owned_shares(records: np.ndarray, first_day: pd.Timestamp, days: int, position: int) -> float:
+    """
+    Return number of shares owned on the day at `position` of `days` days from `first_day` (the same value as `count_owned_shares`
+    gives for the day, but without counting other days).
+
+    records: records packed by `pack_records`
+    """
+    buy_positions, sell_positions = get_record_positions(records, first_day, days)
+    return float(records['amount'][(buy_positions <= position) & (position < sell_positions)].sum())
+
+
+# END OF FILE #
@@ -5,13 +5,18 @@
 
 import PySimpleGUI as sg
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+import pandas as pd
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import Controller as ct
-from Portfolio import SUMMARY_HEADER, ASSETS_HEADER, CURRENCIES, format_value
+import Profiling as prof
+import Downsampling as ds
+from Portfolio import SUMMARY_HEADER, ASSETS_HEADER, CURRENCIES, format_value, format_ratio
 
 
 DEFAULT_GRAPH_TICKERS:list = ['PORTFOLIO']
 ASSET_SHOW_OPTIONS:list = ['All', 'Owned', 'Sold']
+WORKBOOK_CHECK_INTERVAL:int = 2000 # [ms] how often is the loaded workbook checked for changes
 
 sg.theme('Light Blue 2')
 
@@ -24,6 +29,7 @@ class IMMainGui:
         # Initialize GUI attributes
         self._selected_layout:int = 1
         self._graph_tickers = DEFAULT_GRAPH_TICKERS
+        self._reloading:bool = False
 
 
     def _construct_layout(self) -> None:
@@ -51,17 +57,27 @@ class IMMainGui:
 
 
     def open_main_window(self):
+        # Portfolio of the last session is shown at once if it is up to date
+        if self._controller.restore_snapshot():
+            self._initialize_layouts_content()
+            self._change_layout()
+            self.update_log_line("Portfolio was restored from the last session")
         while True:
-            event, values = self._window.read()
+            event, values = self._window.read(timeout=WORKBOOK_CHECK_INTERVAL)
             if event in (sg.WIN_CLOSED, 'Exit', 'Close Invest Manager Appliaction'):
                 break
             else:
-                self._event_load_file(event, values)
-                self._event_change_xlsx(event)
-                self._event_change_currency(event, values)
-                self._event_update_graph(event, values)
-                self._event_plot(event)
-                self._event_filter_summary_table(event, values)
+                with prof.span('event', event): # each event is measured as a whole
+                    self._event_load_file(event, values)
+                    self._event_loading(event, values)
+                    self._event_cancel_loading(event)
+                    self._event_check_workbook(event)
+                    self._event_quotes_updated(event, values)
+                    self._event_change_xlsx(event)
+                    self._event_change_currency(event, values)
+                    self._event_update_graph(event, values)
+                    self._event_plot(event)
+                    self._event_filter_summary_table(event, values)
 
 
 
@@ -76,6 +92,28 @@ class IMMainGui:
         self._window['-LOG_LINE-'].update(log)
 
 
+    # Following methods are called from the loading thread, they just send events to the GUI thread
+
+    def report_loading_progress(self, load_id: int, progress_bar_percentage: float, log: str) -> None:
+        self._window.write_event_value('-LOAD_PROGRESS-', (load_id, progress_bar_percentage, log))
+
+
+    def report_log_line(self, load_id: int, log: str) -> None:
+        self._window.write_event_value('-LOAD_LOG-', (load_id, log))
+
+
+    def report_loading_done(self, load_id: int, portfolio) -> None:
+        self._window.write_event_value('-LOAD_DONE-', (load_id, portfolio))
+
+
+    def report_reloading_done(self, load_id: int, portfolio) -> None:
+        self._window.write_event_value('-RELOAD_DONE-', (load_id, portfolio))
+
+
+    def report_quotes_updated(self, tickers: list[str]) -> None:
+        self._window.write_event_value('-QUOTES_UPDATED-', tickers)
+
+
     def _change_layout(self) -> None:
         self._window[f"-COL{self._selected_layout}-"].update(visible=False)
 
@@ -96,6 +134,7 @@ class IMMainGui:
         """ Updates just content which is related to currency conversions """
         summary_data = self._controller.get_summary_data()
         self.summary_layout.update_summary_layout(summary_data[0], summary_data[1], summary_data[2]) # 0: summary data, 1: total invested money, 2: current portfolio value
+        self.summary_layout.update_analytics(self._controller.get_analytics_data())
         self.assets_layout.update_assets_layout() # This is not necessary currency related
         self.graph_layout.upadte_graph_layout()
 
@@ -105,13 +144,62 @@ class IMMainGui:
         if event == 'Submit':
             self._window['-PROGRESS_BAR-'].update(visible=True)
             self._window['-LOG_TEXT-'].update(visible=True)
-            self._controller.load_assets_data(values['Browse'])
-            self._initialize_layouts_content()
-            self._change_layout()
+            self._window['-CANCEL_LOADING-'].update(visible=True)
+            self.loading_layout.update_login_log_progress_bar(0, "")
+            self._controller.start_loading(values['Browse'])
+
+
+    def _event_loading(self, event, values) -> None:
+        if event not in ('-LOAD_PROGRESS-', '-LOAD_LOG-', '-LOAD_DONE-', '-RELOAD_DONE-'):
+            return
+        load_id = values[event][0]
+        if not self._controller.is_current_loading(load_id):
+            return # events of cancelled loading
+        match event:
+            case '-LOAD_PROGRESS-':
+                self.loading_layout.update_login_log_progress_bar(values[event][1], values[event][2])
+            case '-LOAD_LOG-':
+                self.update_log_line(values[event][1])
+            case '-LOAD_DONE-':
+                self._window['-CANCEL_LOADING-'].update(visible=False)
+                if self._controller.finish_loading(load_id, values[event][1]):
+                    self._initialize_layouts_content()
+                    self._change_layout()
+            case '-RELOAD_DONE-':
+                self._reloading = False
+                if self._controller.finish_loading(load_id, values[event][1]):
+                    self._initialize_layouts_content()
+
+
+    def _event_cancel_loading(self, event) -> None:
+        if event == '-CANCEL_LOADING-':
+            self._controller.cancel_loading()
+            self._window['-CANCEL_LOADING-'].update(visible=False)
+            self.loading_layout.update_login_log_progress_bar(0, "Loading was cancelled")
+
+
+    def _event_check_workbook(self, event) -> None:
+        """ Reload changed assets when loaded workbook was changed (checked periodically while the portfolio is shown) """
+        if event == sg.TIMEOUT_EVENT and self._selected_layout == 2 and not self._reloading and self._controller.is_workbook_changed():
+            self._reloading = True
+            self.update_log_line("Workbook was changed, reloading...")
+            self._controller.start_reloading()
+
+
+    def _event_quotes_updated(self, event, values) -> None:
+        """ Show live prices, only values which depend on the updated assets are refreshed """
+        if event == '-QUOTES_UPDATED-' and self._selected_layout == 2:
+            summary_data = self._controller.get_summary_data()
+            self.summary_layout.update_summary_layout(summary_data[0], summary_data[1], summary_data[2])
+            self.summary_layout.update_analytics(self._controller.get_analytics_data())
+            self.assets_layout.update_changed_rows()
+            self.graph_layout.update_lines(values[event])
 
 
     def _event_change_xlsx(self, event) -> None:
         if event == 'Change .xlsx file':
+            self._controller.cancel_loading() # running reloading
+            self._reloading = False
             self._controller.reset_loaded()
             self._graph_tickers = DEFAULT_GRAPH_TICKERS
             plt.cla() # Clear canvas
@@ -158,7 +246,7 @@ class LoadingLayout(SubLayout):
         self.layout =  [
             [sg.Push(), sg.Text("Inves Manager", justification='center', font=('Courier New',26)), sg.Push()],
             [sg.Text("Enter .xlsx file with investment records: ", size=(34, 1)), sg.Input(), sg.FileBrowse(file_types=(('MS Excel Files', '*.xlsx'),))],
-            [sg.Submit(), sg.Exit()],
+            [sg.Submit(), sg.Exit(), sg.Button('Cancel', key='-CANCEL_LOADING-', visible=False)],
             [sg.ProgressBar(50, size=(60,20), border_width=4, key='-PROGRESS_BAR-', visible=False, expand_x=True)],
             [sg.Text("", key='-LOG_TEXT-', text_color='Black', visible=False)]
         ]
@@ -181,7 +269,8 @@ class SummaryLayout(SubLayout):
                         justification='left', key='-SUM_TABLE-',
                         enable_events=False,
                         expand_x=True, expand_y=True)],
-            [sg.Text("Total Invested EUR: X", key="-TOTAL_INVESTED-"), sg.Text("Current Portfolio Value: X", key='-CURRENT_PORTFOLIO_VALUE-'), sg.Text("Result: ", key='-RESULT_PERCENTAGE-')]
+            [sg.Text("Total Invested EUR: X", key="-TOTAL_INVESTED-"), sg.Text("Current Portfolio Value: X", key='-CURRENT_PORTFOLIO_VALUE-'), sg.Text("Result: ", key='-RESULT_PERCENTAGE-')],
+            [sg.Text("TWR: ", key='-PORTFOLIO_ANALYTICS-')]
         ]
         # Initialize attribute
 
@@ -198,6 +287,15 @@ class SummaryLayout(SubLayout):
         self._window['-RESULT_PERCENTAGE-'].update(percentage)
 
 
+    def update_analytics(self, analytics_data:list[list[any]]) -> None:
+        """ Show analytics of whole portfolio (the last row of `analytics_data`) """
+        if not analytics_data:
+            return
+        _, twr, annualized, drawdown, volatility = analytics_data[-1]
+        self._window['-PORTFOLIO_ANALYTICS-'].update(f"TWR: {format_ratio(twr)}  Annualized Return: {format_ratio(annualized)}  "
+                                                     f"Max Drawdown: {format_ratio(drawdown)}  Volatility: {format_ratio(volatility)}")
+
+
 class AssetLayout(SubLayout):
 
     def __init__(self) -> None:
@@ -228,6 +326,19 @@ class AssetLayout(SubLayout):
                 return [row for row in asset_data if row[3] <= 0]
             
 
+    def update_changed_rows(self) -> None:
+        """ Update just the rows of assets table whose values were changed (the selection and scroll position are kept) """
+        table:sg.Table = self._window['-ASSET_TABLE-']
+        asset_data = self._filter_asset_value(self._controller.get_asset_table_data(), self._window['-ASSET_FILTER_COMBO-'].get())
+        if len(asset_data) != len(table.Values):
+            table.update(values=asset_data)
+            return
+        for tree_id, row, shown_row in zip(table.tree_ids, asset_data, table.Values):
+            if row != shown_row:
+                table.Widget.item(tree_id, values=row)
+        table.Values = asset_data
+
+
     def update_table(self, filter: str) -> None:
         self._window['-ASSET_TABLE-'].update(values=self._filter_asset_value(self._controller.get_asset_table_data(), filter))
 
@@ -242,6 +353,9 @@ class GraphLayout(SubLayout):
         ]
         self._figure, self._ax = plt.subplots()
         self._lines:dict[str, list] = dict()
+        self._series:dict[str, pd.Series] = dict() # full evolution of plotted lines, lines show just downsampled evolution
+        self._updating:bool = False # lines are being updated by `update_graph`, view callbacks are ignored
+        self._connect_view_callbacks()
         
 
     def connect_to_main_window(self, window, controller) -> None:
@@ -249,15 +363,18 @@ class GraphLayout(SubLayout):
             # Link matplotlib to PySimpleGUI Graph
             canvas = FigureCanvasTkAgg(self._figure, self._window['-EVOLUTION_GRAPH-'].TKCanvas)
             canvas.get_tk_widget().pack(side='top', fill='both', expand=1)
+            canvas.mpl_connect('resize_event', lambda event: self._on_view_changed())
             
 
     def upadte_graph_layout(self) -> None:
         ticker_list = DEFAULT_GRAPH_TICKERS + self._controller.get_asset_tickers()
-        default_tickers = self._window['-GRAPH_LIST_BOX-'].get()
+        default_tickers = [ticker for ticker in self._window['-GRAPH_LIST_BOX-'].get() if ticker in ticker_list] # asset could be removed from workbook
         self._window['-GRAPH_LIST_BOX-'].update(values=ticker_list)
         self._window['-GRAPH_LIST_BOX-'].set_value(default_tickers)
         self._lines:dict[str, list] = dict() # Reset lines dictionary
+        self._series = dict()
         plt.cla() # clear plot canvas
+        self._connect_view_callbacks() # callbacks are removed by clearing
         self.update_graph(default_tickers)
         # Set axis x_lable and y_label - It is there, because it changes only if currency or whole layout changes
         self._ax.set_xlabel('Time', fontsize=14)
@@ -265,6 +382,7 @@ class GraphLayout(SubLayout):
         self._ax.grid(True)
 
 
+    @prof.timed('GraphLayout.update_graph')
     def update_graph(self, tickers: list) -> None:
         """ Update displayed graph with given tickers graphs """
         # Remove lines
@@ -273,23 +391,78 @@ class GraphLayout(SubLayout):
             if ticker not in tickers:
                 line = self._lines.pop(ticker)
                 line.remove()
+                self._series.pop(ticker, None)
         # Add lines
         for ticker in tickers:
             if ticker not in self._lines:
                 graph = self._controller.get_evolution_graph(ticker)
-                line, = self._ax.plot(graph, label=ticker)
+                self._series[ticker] = graph
+                line, = self._ax.plot(self._downsample(graph), label=ticker)
                 self._lines[ticker] = line
 
         self._ax.set_title(f"Value evolution of {', '.join(tickers)}", fontsize=14)
         if self._lines:
+            # Limits are counted from whole evolutions (lines could show just a zoomed part), then detail is updated for the shown range
+            self._updating = True
+            self._update_lines_detail(whole_range=True)
             self._ax.relim()
             self._ax.autoscale_view()
+            self._update_lines_detail()
+            self._updating = False
             self._ax.legend()
-        plt.draw()
-        # Draw in PySimpleGui Canvas
+        # Draw in PySimpleGui Canvas (it is the canvas of the figure, so it is drawn just once)
         self._figure.canvas.draw()
 
 
+    def update_lines(self, tickers: list[str]) -> None:
+        """ Redraw shown lines whose evolution was changed by prices of `tickers` (the portfolio line is changed by any of them) """
+        changed = [ticker for ticker in self._lines if ticker in tickers or ticker == 'PORTFOLIO']
+        for ticker in changed:
+            self._series[ticker] = self._controller.get_evolution_graph(ticker)
+        if changed:
+            self._update_lines_detail(tickers=changed)
+            self._figure.canvas.draw_idle()
+
+
+    def _connect_view_callbacks(self) -> None:
+        # Detail of lines is recomputed when the shown date range is changed (zoom, pan, new lines)
+        self._ax.callbacks.connect('xlim_changed', lambda ax: self._on_view_changed())
+
+
+    def _downsample(self, graph: pd.Series, date_from: pd.Timestamp|None=None, date_to: pd.Timestamp|None=None) -> pd.Series:
+        """
+        Return `graph` downsampled to width of the axes in pixels. If the date range is given, only its part (and one value on each side,
+        so that the line continues out of the view) is downsampled.
+        """
+        if date_from is not None and date_to is not None:
+            start = max(graph.index.searchsorted(date_from, side='left') - 1, 0)
+            end = graph.index.searchsorted(date_to, side='right') + 1
+            graph = graph.iloc[start:end]
+        return ds.downsample_min_max(graph, self._ax.get_window_extent().width)
+
+
+    def _update_lines_detail(self, whole_range: bool=False, tickers: list[str]|None=None) -> None:
+        """
+        Downsample lines again for the current date range (or whole evolutions if `whole_range` is True) and size of the axes.
+        tickers: lines which are downsampled, all lines if it is `None`
+        """
+        if not self._series:
+            return
+        date_from, date_to = None, None
+        if not whole_range:
+            date_from, date_to = (pd.Timestamp(mdates.num2date(limit)).tz_convert(None) for limit in self._ax.get_xlim())
+        for ticker in (self._lines.keys() if tickers is None else tickers):
+            graph = self._downsample(self._series[ticker], date_from, date_to)
+            self._lines[ticker].set_data(graph.index, graph.to_numpy())
+
+
+    def _on_view_changed(self) -> None:
+        """ Show lines in detail of the new date range or size after zoom, pan or resize """
+        if not self._updating:
+            self._update_lines_detail()
+            self._figure.canvas.draw_idle()
+
+
     def show_graph_plot(self) -> None:
         # There should be plt.show(block=False), but the application get stuck if is this used.  Without this however, if the plot window is shown and
         # it is manipulated with main window the graph plotting broke, and wont be plotting properly anymore.
@@ -2,26 +2,49 @@
 # Author: Michal Ľaš
 # Date: 26.07.2024
 
+import copy
 import pandas as pd
+import numpy as np
 import FinDataPuller as fdp
 import DataLoader as dl
 import CurrencyConverter as cc
+import Holdings as hd
+import Aggregates as ag
+import Analytics as an
+import DerivedViews as dv
+import SharedEvolution as se
+import Profiling as prof
 from datetime import date
 from functools import reduce
+from typing import Generator
+from collections import OrderedDict
 
 
 # Global variable for currency conversions
 curr_conv:cc.CurrencyConversion = cc.CurrencyConversion()
 # Headers of tables created by Portfolio
 SUMMARY_HEADER:list = ['CATEGORY', 'INVESTED', 'CURRENT VALUE', 'PERCENTAGE', 'GOAL']
-ASSETS_HEADER:list = ['TICKER', 'AVERAGE BUY VALUE', 'CURRENT VALUE', 'OWNED SHARES', 'VALUE OF SHARES', 'PORTFOLIO PERCENTAGE', 'RESULT']
+ASSETS_HEADER:list = ['TICKER', 'AVERAGE BUY VALUE', 'CURRENT VALUE', 'OWNED SHARES', 'VALUE OF SHARES', 'PORTFOLIO PERCENTAGE', 'RESULT',
+                      'TWR', 'ANNUALIZED RETURN', 'MAX DRAWDOWN', 'VOLATILITY']
+ANALYTICS_HEADER:list = ['TICKER', 'TWR', 'ANNUALIZED RETURN', 'MAX DRAWDOWN', 'VOLATILITY']
+SOURCES_HEADER:list = ['SOURCE', 'TICKER', 'INVESTED', 'CURRENT VALUE', 'PORTFOLIO PERCENTAGE']
 # Usable portfolio currencies (they can be used as uniform currencies)
-CURRENCIES:list = ['EUR', 'USD'] 
+CURRENCIES:list = ['EUR', 'USD', 'GBP', 'CHF', 'CZK'] 
+# Maximal number of currencies with cached portfolio evolution
+MAX_CACHED_CURRENCIES:int = 4
 
 class Asset():
+
+    # Assets keep just compact arrays and scalar values, history arrays are shared with FinanceData
+    __slots__ = ('_records', 'ticker', 'name', 'category', 'currency', 'field', 'first_buy', 'invested', 'avg_buy', 'owned', '_history',
+                 '_multiply', 'currency_conversion', 'current_uniform_value', 'invested_uniform_value')
     
-    def __init__(self, ticker: str, portfolio_data: dict, history_data: pd.Series, currency_conversion: str) -> None:
-        self._records:dict = portfolio_data['records'] # dictionary with buy records
+    @prof.timed('Asset.__init__', key_arg=1)
+    def __init__(self, ticker: str, portfolio_data: dict, history_data: fdp.PriceHistory, currency_conversion: str) -> None:
+        """
+        history_data: daily close values of the asset (see `FinanceData.get_history_prices`)
+        """
+        self._records:np.ndarray = hd.pack_records(portfolio_data['records']) # buy records packed to columns
         self.ticker:str = ticker # ticker name
         self.name:str = portfolio_data['info']['Name'] # Whole name of asset
         self.category:str = portfolio_data['info']['Category'] # asset category
@@ -31,13 +54,12 @@ class Asset():
         self.invested:float = portfolio_data['results']['INVESTED'] # how much money was invested
         self.avg_buy:float = portfolio_data['results']['Average buy value'] # what is the average buy
         self.owned:float = portfolio_data['results']['OWNED'] # how much shares is owned
-        self._history_data:pd.Series = history_data # asset price evolution
+        self._history:fdp.PriceHistory = history_data # asset price evolution
         self._multiply = 1 # conversion value for some assets like CSP1.L
 
         self.currency_conversion = currency_conversion # Uniform currency (There is choosen one currency as uniform)
         self.current_uniform_value:float = self._get_current_uniform_value() # Value of owned asset in uniform currency
         self.invested_uniform_value:float = self._get_invested_uniform_value() # Value of investment in this asset at current currency conversion rate
-        self.evolution_uniform:pd.DataFrame = self._count_evolution_in_uniform_currency() # Evolution of value of this asset in uniform currency
     
 
 
@@ -46,9 +68,9 @@ class Asset():
         Return current value of the owned asset in the chosen uniform currency.
         """
         if self.currency != self.currency_conversion:
-            return curr_conv.convert(self.owned / self._multiply * self._history_data.iloc[-1], self.currency, self.currency_conversion)
+            return curr_conv.convert(self.owned / self._multiply * self._history.last_close, self.currency, self.currency_conversion)
         else:
-            return self.owned / self._multiply * self._history_data.iloc[-1]
+            return self.owned / self._multiply * self._history.last_close
         
 
     def _get_invested_uniform_value(self) -> int|float:
@@ -59,26 +81,61 @@ class Asset():
             return self.invested
         
 
-    def _count_evolution_in_uniform_currency(self) -> pd.DataFrame:
+    def get_evolution_days(self) -> tuple[pd.Timestamp, int]:
+        """ Return the first day and number of days of the evolution of this asset """
+        return self._history.first_day, self._history.get_days()
+
+
+    def get_records(self) -> np.ndarray:
+        """ Return records of the asset packed by `Holdings.pack_records` """
+        return self._records
+
+
+    def count_evolution(self, owned_shares: np.ndarray|None=None) -> np.ndarray:
         """
-        Count the evolution of this asset value in chosen uniform currency.
+        Count the evolution of this asset value in its currency for each day of its history.
+        owned_shares: shares owned on each day of the history if they were already counted (see `Holdings.count_owned_shares_matrix`)
         """
-        owned_shares_frame = pd.DataFrame(0.0, columns=['value'], index=self._history_data.index)
+        # The last day is valued by the exact last close, which can be a live price (see `set_last_close`)
+        return hd.count_value_evolution(self._records, self._history, self._multiply, owned_shares)
 
-        # Update the DataFrame based on transactions
-        for tx in self._records:
-            buy_date = tx['Buy Date']
-            sell_date = tx['Sell Date'] or fdp.today
-            amount = tx['Amount'] / self._multiply
-            owned_shares_frame[buy_date:sell_date] += amount
 
-        result = owned_shares_frame.mul(self._history_data, axis=0)
+    def get_evolution_inputs(self) -> tuple[np.ndarray, fdp.PriceHistory, float]:
+        """ Return (packed records, price history, multiply), the data from which `count_evolution` counts the evolution """
+        return self._records, self._history, self._multiply
 
-        # Conversion to EUR
-        if self.category != self.currency_conversion:
-            return result.apply(lambda x: curr_conv.convert(x.iloc[0], self.currency, self.currency_conversion, x.name.date()), axis=1)
-        else:
-            return result 
+
+    def get_last_evolution_value(self) -> float:
+        """ Return value of this asset in its currency on the last day of its history (the last value of `count_evolution`) """
+        days = self._history.get_days()
+        return hd.get_owned_shares(self._records, self._history.first_day, days, days - 1) / self._multiply * self._history.last_close
+
+
+    def set_last_close(self, close: float) -> None:
+        """ Set value of asset unit on the last day of its history (e.g. live price), values of other days are not changed """
+        self._history = self._history._replace(last_close=close)
+        self.current_uniform_value = self._get_current_uniform_value()
+
+
+    def get_cash_flows(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Return cash flows of the asset in its currency as tuple (buy positions, buy values, sell positions, sell values). Positions are
+        days of the history: the first day on which bought shares are owned and the first day on which sold shares are not owned.
+        Missing values are counted from the close value of the day, flows after the last day of the history are left out.
+        """
+        days = self._history.get_days()
+        buy_positions, sell_positions = hd.get_record_positions(self._records, self._history.first_day, days)
+        flows = []
+        for positions, values, value_days in ((buy_positions, self._records['buy_value'], buy_positions),
+                                              (sell_positions, self._records['sell_value'], sell_positions - 1)):
+            kept = positions < days
+            positions, values, value_days = positions[kept], values[kept], value_days[kept]
+            missing = np.isnan(values)
+            if missing.any():
+                values = values.copy()
+                values[missing] = self._records['amount'][kept][missing] / self._multiply * self._history.get_closes_as_of(value_days[missing])
+            flows += [positions, values]
+        return tuple(flows)
 
 
     def change_uniform_currency(self, currency_conversion: str) -> None:
@@ -86,31 +143,31 @@ class Asset():
             self.currency_conversion = currency_conversion
             self.current_uniform_value = self._get_current_uniform_value()
             self.invested_uniform_value = self._get_invested_uniform_value()
-            self.evolution_uniform = self._count_evolution_in_uniform_currency()
     
 
     def get_current_asset_value(self) -> int|float:
         """
         Return current value of asset unit in its currency. (It is not converted to uniform currency!)
         """
-        return self._history_data.iloc[-1]
+        return self._history.last_close
 
 
     def get_current_value(self) -> int|float:
         """
         Return current value of owned asset in its currency. (It is not converted to uniform currency!)
         """
-        return self.owned / self._multiply * self._history_data.iloc[-1]
+        return self.owned / self._multiply * self._history.last_close
 
 
 class CSP1Asset(Asset):
 
-    def __init__(self, ticker: str, portfolio_data: dict, history_data: pd.Series, currency_conversion: str) -> None:
+    __slots__ = ()
+
+    def __init__(self, ticker: str, portfolio_data: dict, history_data: fdp.PriceHistory, currency_conversion: str) -> None:
         super().__init__(ticker, portfolio_data, history_data, currency_conversion)
         self._multiply = 100 # CSP1.L has a 100x multiply
         # Recount thes attributes, because _multiply have changed
         self.current_uniform_value:float = self._get_current_uniform_value()
-        self.evolution_uniform:pd.DataFrame = self._count_evolution_in_uniform_currency()
 
     
 
@@ -137,16 +194,23 @@ def format_value(value:float, currency:str) -> str:
     return f"{round(value, 2)}{symbol}"
 
 
+def format_ratio(value:float) -> str:
+    """ Return ratio formated as percents, '-' is returned for unknown value (NaN) """
+    return '-' if np.isnan(value) else format_value(value * 100, '%')
+
+
 
 class Portfolio:
 
-    def __init__(self, portfolio_data_loader: dl.DataLoader, history_data_puller: fdp.FinanceData, currency_conversion: str='EUR') -> None:
+    def __init__(self, portfolio_data_loader: dl.DataLoader, history_data_puller: fdp.FinanceData, currency_conversion: str='EUR',
+                 evolution_workers: int=0) -> None:
         """
         Constructor for Portfolio.
 
         portfolio_data_loader: dl.DataLoader - data loader for excel files
         history_data_puller: fdp.FinanceData - data puller for history stock data
         currency_conversion: str - ticker of currency to which will be final portfolio value converted, default is EUR
+        evolution_workers: int - number of processes which count evolutions of assets, evolutions are counted in the calling thread if it is less than 2
         """
         self._dl:dl.DataLoader = portfolio_data_loader
         self._fdp:fdp.FinanceData = history_data_puller
@@ -154,15 +218,57 @@ class Portfolio:
         self._portfolio_uniform_value:float = 0 # Value of portfolio in uniform currency (currency_conversion)
         # Get categories
         self.currency_conversion = currency_conversion # Uniform currency (one of the currencies like EUR, USD,...)
-        self._evolution_data = None
-        self._asset_data = None
+        self._evolution_workers:int = evolution_workers
+        self._reset_evolution_matrix()
+        # Tables are computed only when their inputs change
+        self._views:dv.DerivedViews = dv.DerivedViews()
+        self._views.declare('summary', (dv.CURRENCY, dv.ASSETS, dv.PRICES), self._compute_summary_data)
+        self._views.declare('assets', (dv.CURRENCY, dv.ASSETS, dv.PRICES), self._compute_assets_data)
+        self._views.declare('analytics', (dv.CURRENCY, dv.ASSETS, dv.PRICES), self._compute_analytics_data)
+        self._views.declare('total_invested', (dv.CURRENCY, dv.ASSETS), self._compute_total_invested)
+        self._views.declare('sources', (dv.CURRENCY, dv.ASSETS, dv.PRICES), self._compute_sources_data)
+
+
+    def __getstate__(self) -> dict:
+        """ Portfolio is pickled without its history data puller (see `set_history_data_puller`), evolution matrix in shared memory is pickled as an array """
+        state = self.__dict__.copy()
+        state['_fdp'] = None
+        state['_shared_memory'] = None
+        return state
+
+
+    def set_history_data_puller(self, history_data_puller: fdp.FinanceData) -> None:
+        """ Set data puller used for new assets (e.g. after the portfolio is unpickled) """
+        self._fdp = history_data_puller
 
 
     def reset_portfolio(self) -> None:
         self._assets = dict()
         self._portfolio_uniform_value = 0
-        self._evolution_data = None
-        self._asset_data = None
+        self._views.invalidate(dv.ASSETS, dv.RECORDS)
+        self._reset_evolution_matrix()
+
+
+    def _reset_evolution_matrix(self) -> None:
+        """ Drop evolution matrix, it will be built again when it is needed """
+        self._dates:pd.DatetimeIndex|None = None # days shared by evolutions of all assets
+        self._evolution_matrix:np.ndarray|None = None # daily values of assets in their currencies (assets x dates)
+        # Shared memory of evolution matrix counted by worker processes, it is freed after the matrix is dropped
+        if getattr(self, '_shared_memory', None) is not None:
+            se.release(self._shared_memory)
+        self._shared_memory = None
+        self._evolution_currencies:list[str] = list() # currency of each row of evolution matrix
+        self._evolution_rows:dict[str, tuple[int, int]] = dict() # ticker: (row in evolution matrix, position of the first day of the asset)
+        # Cash flows of assets in their currencies: (rows, positions in dates, values, True for sells)
+        self._cash_flows:tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]|None = None
+        # Cash flows on the last day (rows, values, True for sells), they are needed when the last day is updated by live prices
+        self._last_day_flows:tuple[np.ndarray, np.ndarray, np.ndarray]|None = None
+        # Evolution matrices and their column sums (portfolio value) converted to currencies, the least recently used currency is evicted first
+        self._uniform_evolutions:OrderedDict[str, tuple[np.ndarray, np.ndarray]] = OrderedDict()
+        # Aggregated levels of uniform evolutions (rows of assets and the last row of portfolio) for currencies in `_uniform_evolutions`
+        self._uniform_levels:dict[str, dict[str, ag.Level]] = dict()
+        # Analytics of uniform evolutions (rows of assets and the last row of portfolio) for currencies in `_uniform_evolutions`
+        self._uniform_analytics:dict[str, an.Analytics] = dict()
 
 
     def make_currency_conversion(self, currency_conversion: str) -> None:
@@ -170,7 +276,8 @@ class Portfolio:
         if self.currency_conversion != currency_conversion:
             self.currency_conversion = currency_conversion
             self._portfolio_uniform_value = 0
-            self._evolution_data = None
+            self._views.invalidate(dv.CURRENCY)
+            # Evolutions do not have to be recounted, they are converted when they are needed (see `_get_uniform_evolution`)
             for asset in self._assets.values():
                 asset.change_uniform_currency(currency_conversion)
                 self._portfolio_uniform_value += asset.current_uniform_value
@@ -181,14 +288,75 @@ class Portfolio:
         """
         Creates Asset object. Return `None` on failure
         """
-        asset = None
         portfolio_data:dict|None = self._dl.get_ticker_data(ticker)
         if portfolio_data is None:
             return None
         
         self._fdp.pull_ticker_history_data(ticker, portfolio_data['info']['First buy'])
 
-        history_data:pd.Series = self._fdp.get_history_data(ticker)
+        return self._add_asset(ticker, portfolio_data)
+    
+
+    def construct_assets(self, tickers: list[str]) -> Generator[tuple[str, Asset|None, Exception|None], None, None]:
+        """
+        Creates Asset objects of given `tickers`. History data are pulled concurrently and each Asset is created as soon as its data arrive.
+        Yields tuple (ticker, asset, error). The `asset` is `None` on failure and `error` holds the exception which caused the failure (if any).
+        """
+        tickers_data:dict[str, dict] = dict()
+        for ticker in tickers:
+            portfolio_data:dict|None = self._dl.get_ticker_data(ticker)
+            if portfolio_data is None:
+                yield ticker, None, None
+            else:
+                tickers_data[ticker] = portfolio_data
+
+        first_buys = {ticker: data['info']['First buy'] for ticker, data in tickers_data.items()}
+        for ticker, error in self._fdp.pull_tickers_history_data(first_buys):
+            asset = None
+            if error is None:
+                try:
+                    asset = self._add_asset(ticker, tickers_data[ticker])
+                except Exception as e:
+                    error = e
+            yield ticker, asset, error
+
+        # Keep order of assets from the workbook, not the order in which their data arrived
+        order = {ticker: i for i, ticker in enumerate(self._dl.get_all_tickers())}
+        self._assets = dict(sorted(self._assets.items(), key=lambda item: order.get(item[0], len(order))))
+        self._views.invalidate(dv.ASSETS)
+
+
+    def copy_unchanged(self, portfolio_data_loader: dl.DataLoader, changed_tickers: set[str]) -> 'Portfolio':
+        """
+        Return new Portfolio with data of `portfolio_data_loader` which reuses assets of this portfolio. Assets of `changed_tickers` and
+        assets which are not in this portfolio are not added, they have to be constructed (see `construct_assets`).
+        Assets which are not in `portfolio_data_loader` are left out.
+        Assets are copied (their arrays are shared), so live prices applied to this portfolio do not change the new one.
+        """
+        portfolio = Portfolio(portfolio_data_loader, self._fdp, self.currency_conversion, self._evolution_workers)
+        for ticker in portfolio_data_loader.get_all_tickers():
+            if ticker in self._assets and ticker not in changed_tickers:
+                asset = copy.copy(self._assets[ticker])
+                portfolio._assets[ticker] = asset
+                portfolio._portfolio_uniform_value += asset.current_uniform_value
+        portfolio._views.invalidate(dv.ASSETS)
+        return portfolio
+
+
+    def get_data_loader(self) -> dl.DataLoader:
+        return self._dl
+
+
+    def get_view_statistics(self) -> dict[str, dv.ViewStatistics]:
+        """ Return hits and misses of cached tables (summary, assets, analytics, total invested and sources) """
+        return self._views.get_statistics()
+
+
+    def _add_asset(self, ticker: str, portfolio_data: dict) -> Asset:
+        """
+        Creates Asset object from already pulled history data and adds it to the portfolio.
+        """
+        history_data:fdp.PriceHistory = self._fdp.get_history_prices(ticker)
 
         if ticker == 'CSP1.L':
             asset = CSP1Asset(ticker, portfolio_data, history_data, self.currency_conversion)
@@ -197,6 +365,8 @@ class Portfolio:
         
         self._portfolio_uniform_value += asset.current_uniform_value
         self._assets[ticker] = asset
+        self._views.invalidate(dv.ASSETS)
+        self._reset_evolution_matrix()
         return asset
     
 
@@ -205,7 +375,10 @@ class Portfolio:
         Get agregated values for summary table. 
         These are based on `SUMMARY_HEADER`: ['CATEGORY', 'INVESTED' (€), 'CURRENT VALUE' (€), 'PERCENTAGE' (%), 'GOAL' (%)]
         """
+        return self._views.get('summary')
 
+
+    def _compute_summary_data(self) -> list[list[any]]:
         # Initialize 'table'
         tmp_result:dict[str, dl.TableRow] = {} # category: col_name: value
         result:list[list[any]] = list()
@@ -233,13 +406,15 @@ class Portfolio:
     def get_assets_data(self) -> list[list[any]]:
         """
         Get agregated values for average value of portfolio buys and results.
-        These are based on ASSETS_HEADER: ['TICKER', 'AVERAGE BUY VALUE' (CURR.), 'CURRENT VALUE' (CURR.), 'OWNED SHARES', 'VALUE OF SHARES' (CURR.), 'PORTFOLIO PERCENTAGE' (%), 'RESULT' (%)]
+        These are based on ASSETS_HEADER: ['TICKER', 'AVERAGE BUY VALUE' (CURR.), 'CURRENT VALUE' (CURR.), 'OWNED SHARES', 'VALUE OF SHARES' (CURR.), 'PORTFOLIO PERCENTAGE' (%), 'RESULT' (%),
+        'TWR' (%), 'ANNUALIZED RETURN' (%), 'MAX DRAWDOWN' (%), 'VOLATILITY' (%)]
         """
-        # Check if cache
-        if self._asset_data is not None:
-            return self._asset_data
+        return self._views.get('assets')
+
 
+    def _compute_assets_data(self) -> list[list[any]]:
         result:list[list[any]] = list()
+        analytics = {row[0]: row[1:] for row in self.get_analytics_data()}
 
         for asset in self._assets.values():
             row = list()
@@ -250,9 +425,9 @@ class Portfolio:
             row.append(format_value(asset.get_current_value(), asset.currency))
             row.append(format_value((asset.current_uniform_value / self._portfolio_uniform_value) * 100, '%'))
             row.append(format_value((asset.current_uniform_value - asset.invested_uniform_value) / asset.invested_uniform_value * 100, '%'))
+            row.extend(format_ratio(value) for value in analytics[asset.ticker])
             result.append(row)
 
-        self._asset_data = result
         return result
 
 
@@ -263,6 +438,10 @@ class Portfolio:
 
     def get_total_invested(self) -> float:
         """ Return money invested into the portfolio in uniform currency."""
+        return self._views.get('total_invested')
+
+
+    def _compute_total_invested(self) -> float:
         result:float = 0
         for asset in self._assets.values():
             result += curr_conv.convert(asset.invested, asset.currency, self.currency_conversion)
@@ -275,35 +454,278 @@ class Portfolio:
         return self._portfolio_uniform_value
     
 
-    def get_evolution_data(self) -> pd.DataFrame|None:
+    def _build_evolution_matrix(self) -> bool:
         """
-        Return evolution data of this portfolio
+        Build matrix with evolutions of all assets aligned to shared days. Return `False` if there are no assets.
         """
-        # Check if cached
-        if self._evolution_data is not None:
-            return self._evolution_data
+        if self._evolution_matrix is not None:
+            return True
 
         assets = list(self._assets.values())
 
         if len(assets) == 0:
-            return None
+            return False
+
+        # Evolutions of assets have continuous daily indexes, so each of them is one block of matrix row
+        ranges = [asset.get_evolution_days() for asset in assets]
+        date_from = min(first_day for first_day, _ in ranges)
+        date_to = max(first_day + pd.Timedelta(days=days - 1) for first_day, days in ranges)
+        self._dates = pd.date_range(start=date_from, end=date_to, freq='D')
+        starts = [(first_day - date_from).days for first_day, _ in ranges]
+        shape = (len(assets), len(self._dates))
+        if self._evolution_workers > 1 and len(assets) > 1:
+            # Worker processes get just packed records and price arrays of assets, they write evolutions to shared memory
+            tasks = [(row, start, *asset.get_evolution_inputs()) for row, (asset, start) in enumerate(zip(assets, starts))]
+            self._evolution_matrix, self._shared_memory = se.build_evolution_matrix(tasks, shape, self._evolution_workers)
+        else:
+            # Holdings of all assets are counted at once, then each row is valued in place by close values of its asset
+            self._evolution_matrix = hd.count_owned_shares_matrix([asset.get_records() for asset in assets], [first_day for first_day, _ in ranges],
+                                                                  [days for _, days in ranges], starts, len(self._dates))
+            for row, (asset, start, (_, days)) in enumerate(zip(assets, starts, ranges)):
+                self._evolution_matrix[row, start:start + days] = asset.count_evolution(self._evolution_matrix[row, start:start + days])
+
+        flows:list[tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = list()
+        for row, (asset, start) in enumerate(zip(assets, starts)):
+            self._evolution_rows[asset.ticker] = (row, start)
+            self._evolution_currencies.append(asset.currency)
+            buy_positions, buy_values, sell_positions, sell_values = asset.get_cash_flows()
+            positions = np.concatenate([buy_positions, sell_positions]) + start
+            flows.append((np.full(len(positions), row), positions, np.concatenate([buy_values, sell_values]),
+                          np.arange(len(positions)) >= len(buy_positions)))
+        self._cash_flows = tuple(np.concatenate(column) for column in zip(*flows))
+        rows, positions, values, sells = self._cash_flows
+        last_day = positions == len(self._dates) - 1
+        self._last_day_flows = (rows[last_day], values[last_day], sells[last_day])
+
+        return True
+
+
+    def _get_conversion_rates(self, currency: str, dates: pd.DatetimeIndex|None=None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return daily conversion rates to `currency` (one row for each currency of assets) and row of rates for each row of evolution matrix.
+        Rates are given for `dates` (all days of evolution matrix if it is `None`). Evolution matrix has to be built.
+        """
+        if dates is None:
+            dates = self._dates
+        currencies = sorted(set(self._evolution_currencies))
+        rates = np.vstack([curr_conv.get_conversion_rates(c, currency, dates) if c != currency else np.ones(len(dates)) for c in currencies])
+        return rates, np.array([currencies.index(c) for c in self._evolution_currencies])
+
+
+    @prof.timed('update_live_quotes')
+    def update_live_quotes(self, quotes: dict[str, float]) -> list[str]:
+        """
+        Use live prices `quotes` (ticker: price in currency of the asset) as values of assets on the last day of their histories (today).
+        Only the last day of evolutions and its aggregates and analytics are updated, so the work does not depend on the length
+        of histories. Tickers which are not in the portfolio and invalid prices are ignored.
+        Return tickers whose values were changed.
+        """
+        # All prices are checked before any asset is changed, so an invalid price does not leave the portfolio partly updated
+        changes = {ticker: price for ticker, price in quotes.items() if ticker in self._assets and np.isfinite(price) and price > 0
+                   and price != self._assets[ticker].get_current_asset_value()}
+        updated:list[str] = list(changes.keys())
+        for ticker, price in changes.items():
+            self._assets[ticker].set_last_close(price)
+            if self._fdp is not None:
+                self._fdp.set_last_close(ticker, price) # assets constructed later (e.g. by reloading) use the price as well
+
+        if updated:
+            self._portfolio_uniform_value = sum(asset.current_uniform_value for asset in self._assets.values())
+            if self._evolution_matrix is not None:
+                self._update_last_day(updated)
+            self._views.invalidate(dv.PRICES)
+        return updated
+
+
+    def _update_last_day(self, tickers: list[str]) -> None:
+        """
+        Update the last day of evolution matrix and of its cached conversions, aggregates and analytics for assets of `tickers`.
+        Histories of all assets end today, so the last day of each asset is the last column of the matrix.
+        """
+        rows = np.array([self._evolution_rows[ticker][0] for ticker in tickers])
+        starts = np.array([self._evolution_rows[ticker][1] for ticker in tickers])
+        self._evolution_matrix[rows, -1] = [self._assets[ticker].get_last_evolution_value() for ticker in tickers]
+        last_day = len(self._dates) - 1
+        flow_rows, flow_values, flow_sells = self._last_day_flows
+
+        for currency, (matrix, total) in self._uniform_evolutions.items():
+            rates, rate_rows = self._get_conversion_rates(currency, self._dates[-1:])
+            matrix[rows, -1] = self._evolution_matrix[rows, -1] * rates[rate_rows[rows], 0]
+            total[-1] = matrix[:, -1].sum()
+
+            if currency in self._uniform_levels:
+                levels = self._uniform_levels[currency]
+                start = ag.get_update_start(levels, last_day)
+                values = np.vstack([matrix[:, start:], total[start:]])
+                for row, first_day in self._evolution_rows.values():
+                    values[row, :max(first_day - start, 0)] = np.nan
+                ag.update_levels(levels, values, last_day, start)
+
+            if currency in self._uniform_analytics:
+                # Flows of the portfolio (the last row) are sums of flows of all assets
+                flows = np.zeros((2, len(matrix) + 1))
+                converted = flow_values * rates[rate_rows[flow_rows], 0]
+                np.add.at(flows, (flow_sells.astype(np.intp), flow_rows), converted)
+                np.add.at(flows, (flow_sells.astype(np.intp), len(matrix)), converted)
+                series = np.append(rows, len(matrix))
+                days = [max(last_day - 1, 0), last_day]
+                values = np.vstack([matrix[np.ix_(rows, days)], total[days]])
+                an.update_last_day(self._uniform_analytics[currency], series, values, flows[0, series], flows[1, series], np.append(starts, 0))
+
+
+    def _get_uniform_evolution(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return evolution matrix converted to uniform currency and its column sums (daily portfolio value). Evolution matrix has to be built.
+        Converted matrices are cached for the last `MAX_CACHED_CURRENCIES` currencies.
+        """
+        currency = self.currency_conversion
+        if currency in self._uniform_evolutions:
+            self._uniform_evolutions.move_to_end(currency)
+            return self._uniform_evolutions[currency]
+
+        rates, rows = self._get_conversion_rates(currency)
+        matrix = self._evolution_matrix * rates[rows]
+
+        self._uniform_evolutions[currency] = (matrix, matrix.sum(axis=0))
+        if len(self._uniform_evolutions) > MAX_CACHED_CURRENCIES:
+            evicted, _ = self._uniform_evolutions.popitem(last=False)
+            self._uniform_levels.pop(evicted, None)
+            self._uniform_analytics.pop(evicted, None)
+        return self._uniform_evolutions[currency]
+
+
+    def _get_uniform_levels(self) -> dict[str, ag.Level]:
+        """
+        Return weekly and monthly aggregates of uniform evolutions of assets and portfolio (the last row). They are built on the first use
+        for each currency. Evolution matrix has to be built.
+        """
+        currency = self.currency_conversion
+        matrix, total = self._get_uniform_evolution()
+        if currency not in self._uniform_levels:
+            values = np.vstack([matrix, total])
+            # Days before the first day of an asset are not part of its evolution
+            for row, first_day in self._evolution_rows.values():
+                values[row, :first_day] = np.nan
+            self._uniform_levels[currency] = ag.build_levels(self._dates, values)
+        return self._uniform_levels[currency]
+
+
+    def _get_uniform_analytics(self) -> an.Analytics:
+        """
+        Return analytics of uniform evolutions of assets and portfolio (the last row). Cash flows are converted by the rate of their day.
+        They are computed on the first use for each currency. Evolution matrix has to be built.
+        """
+        currency = self.currency_conversion
+        matrix, total = self._get_uniform_evolution()
+        if currency not in self._uniform_analytics:
+            rows, positions, values, sells = self._cash_flows
+            rates, rate_rows = self._get_conversion_rates(currency)
+            values = values * rates[rate_rows[rows], positions]
+            # Flows of the portfolio are sums of flows of all assets
+            flows = np.zeros((2, len(matrix) + 1, len(self._dates)))
+            np.add.at(flows, (sells.astype(np.intp), rows, positions), values)
+            np.add.at(flows, (sells.astype(np.intp), len(matrix), positions), values)
+            starts = np.array([first_day for _, first_day in self._evolution_rows.values()] + [0])
+            self._uniform_analytics[currency] = an.compute_analytics(np.vstack([matrix, total]), flows[0], flows[1], starts)
+        return self._uniform_analytics[currency]
+
+
+    def get_analytics_data(self) -> list[list[any]]:
+        """
+        Get analytics of assets and of whole portfolio (the last row named 'PORTFOLIO') in uniform currency.
+        These are based on ANALYTICS_HEADER: ['TICKER', 'TWR', 'ANNUALIZED RETURN', 'MAX DRAWDOWN', 'VOLATILITY'], values are ratios (not percents).
+        Volatility is NaN if the asset is held for less than a year.
+        """
+        return self._views.get('analytics')
+
+
+    def _compute_analytics_data(self) -> list[list[any]]:
+        if not self._build_evolution_matrix():
+            return []
+
+        analytics = self._get_uniform_analytics()
+        tickers = list(self._evolution_rows.keys()) + ['PORTFOLIO']
+        columns = (analytics.twr, analytics.annualized_return, analytics.max_drawdown, analytics.volatility)
+        return [[ticker] + [float(column[row]) for column in columns] for row, ticker in enumerate(tickers)]
 
-        result:pd.DataFrame = assets[0].evolution_uniform
-        for asset in assets[1:]:
-            result = result.add(asset.evolution_uniform, axis=0, fill_value=0)
 
-        self._evolution_data = result
+    def get_sources_data(self) -> list[list[any]]:
+        """
+        Get breakdown of assets by workbooks from which the portfolio was loaded (see `DataLoader.consolidate`) in uniform currency.
+        These are based on SOURCES_HEADER: ['SOURCE', 'TICKER', 'INVESTED', 'CURRENT VALUE', 'PORTFOLIO PERCENTAGE' (%)].
+        Current value of an asset is split by owned shares in each workbook, so its evolution is counted only once.
+        """
+        return self._views.get('sources')
+
+
+    def _compute_sources_data(self) -> list[list[any]]:
+        result:list[list[any]] = list()
+        for source, results in self._dl.get_source_results().items():
+            for ticker, row in results.items():
+                asset = self._assets.get(ticker)
+                if asset is None:
+                    continue
+                share = (row['OWNED'] or 0) / asset.owned if asset.owned else 0
+                invested = curr_conv.convert(row['INVESTED'] or 0, asset.currency, self.currency_conversion)
+                current = asset.current_uniform_value * share
+                result.append([source, ticker, format_value(invested, self.currency_conversion), format_value(current, self.currency_conversion),
+                               format_value(current / self._portfolio_uniform_value * 100, '%')])
         return result
+
+
+    def _get_evolution_series(self, values: np.ndarray, first_day: int, date_from: str|None, date_to: str|None) -> pd.Series:
+        """ Return part of daily `values` from `first_day` between `date_from` and `date_to` """
+        start, stop = self._dates.slice_locs(date_from, date_to)
+        start = max(start, first_day)
+        return pd.Series(values[start:stop], index=self._dates[start:stop], copy=False)
+
+
+    @prof.timed('get_evolution_data')
+    def get_evolution_data(self, date_from: str|None=None, date_to: str|None=None) -> pd.Series|None:
+        """
+        Return evolution data of this portfolio
+        Optional arguments are date_from and date_to (in string format 'YYYY-mm-dd') which can filter the output data.
+        """
+        if not self._build_evolution_matrix():
+            return None
+
+        _, total = self._get_uniform_evolution()
+        return self._get_evolution_series(total, 0, date_from, date_to)
     
 
-    def get_ticker_evolution_data(self, ticker: str) -> pd.DataFrame|None:
+    def get_ticker_evolution_data(self, ticker: str, date_from: str|None=None, date_to: str|None=None) -> pd.Series|None:
         """
         Return evolution graph data of an Asset with the given `ticker`
+        Optional arguments are date_from and date_to (in string format 'YYYY-mm-dd') which can filter the output data.
         """
-        asset =  self._assets.get(ticker, None)
-        if asset is not None:
-            return asset.evolution_uniform
-        return asset        
+        if ticker not in self._assets or not self._build_evolution_matrix():
+            return None
+
+        matrix, _ = self._get_uniform_evolution()
+        row, first_day = self._evolution_rows[ticker]
+        return self._get_evolution_series(matrix[row], first_day, date_from, date_to)
+
+
+    def get_evolution_aggregates(self, ticker: str|None=None, date_from: str|None=None, date_to: str|None=None, points: int=0) -> pd.DataFrame|None:
+        """
+        Return aggregated evolution of an Asset with the given `ticker` (or of whole portfolio if `ticker` is None) in the coarsest resolution
+        (monthly, weekly or daily) with at least `points` periods between `date_from` and `date_to`. Columns of the result are
+        'LAST', 'MIN', 'MAX' (values in the period) and 'RETURN' (change against the previous period), index holds the last day of each period.
+        """
+        if (ticker is not None and ticker not in self._assets) or not self._build_evolution_matrix():
+            return None
+
+        matrix, total = self._get_uniform_evolution()
+        row, first_day = self._evolution_rows[ticker] if ticker is not None else (len(self._evolution_rows), 0)
+        level = ag.select_level(self._get_uniform_levels(), date_from, date_to, points)
+        if level is None:
+            daily = self._get_evolution_series(total if ticker is None else matrix[row], first_day, date_from, date_to)
+            return pd.DataFrame({'LAST': daily, 'MIN': daily, 'MAX': daily, 'RETURN': daily.pct_change()})
+
+        start, stop = level.dates.slice_locs(date_from, date_to)
+        start = max(start, int(np.searchsorted(level.starts, first_day, side='right')) - 1)
+        columns = {'LAST': level.last, 'MIN': level.minimum, 'MAX': level.maximum, 'RETURN': level.returns}
+        return pd.DataFrame({name: values[row, start:stop] for name, values in columns.items()}, index=level.dates[start:stop])
 
 
 # END OF FILE #
\ No newline at end of file
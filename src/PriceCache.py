@@ -0,0 +1,68 @@
+##
+# Date: 17.10.2026
+
+import sqlite3
+import pandas as pd
+import os.path as op
+from contextlib import closing
+from datetime import date
+from AppPaths import get_data_directory
+
+
+class PriceCache:
+    """
+    Persistent cache of ticker close prices stored in SQLite database in directory `price_data` (next to the `ecb_data` directory).
+    Every write is done in one transaction, so the cache stays consistent even if the application crashes in the middle of a write.
+    """
+
+    def __init__(self, db_path: str|None=None) -> None:
+        """
+        db_path: path of the database file, default is `price_data/history.sqlite` in application directory
+        """
+        if db_path is None:
+            db_path = op.join(get_data_directory("price_data"), "history.sqlite")
+        self._db_path:str = db_path
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS tickers (ticker TEXT PRIMARY KEY, date_from TEXT NOT NULL, pulled TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS prices (ticker TEXT NOT NULL, date TEXT NOT NULL, close REAL NOT NULL, PRIMARY KEY (ticker, date)) WITHOUT ROWID")
+
+
+    def _connect(self) -> sqlite3.Connection:
+        # New connection for every operation, because data are pulled from many threads
+        return sqlite3.connect(self._db_path, timeout=30)
+
+
+    def load(self, ticker: str) -> tuple[date, date, pd.Series]|None:
+        """
+        Return cached data of `ticker` as tuple (date_from, pulled, closes). `date_from` is the date from which the data were pulled,
+        `pulled` is the date of the last download and `closes` are close prices indexed by date.
+        Return `None` if the `ticker` is not cached.
+        """
+        with closing(self._connect()) as conn:
+            meta = conn.execute("SELECT date_from, pulled FROM tickers WHERE ticker = ?", (ticker,)).fetchone()
+            if meta is None:
+                return None
+            rows = conn.execute("SELECT date, close FROM prices WHERE ticker = ? ORDER BY date", (ticker,)).fetchall()
+
+        closes = pd.Series([row[1] for row in rows], index=pd.to_datetime([row[0] for row in rows]), name='Close', dtype=float)
+        return date.fromisoformat(meta[0]), date.fromisoformat(meta[1]), closes
+
+
+    def store(self, ticker: str, date_from: date, pulled: date, closes: pd.Series, replace: bool=False) -> None:
+        """
+        Store close prices of `ticker`. Prices of already cached dates are overwritten.
+        date_from: date from which are the data of `ticker` pulled
+        pulled: date of the download
+        closes: close prices indexed by date
+        replace: if True, all previously cached prices of `ticker` are removed
+        """
+        rows = [(ticker, f"{index:%Y-%m-%d}", float(value)) for index, value in closes.items()]
+        with closing(self._connect()) as conn, conn:
+            if replace:
+                conn.execute("DELETE FROM prices WHERE ticker = ?", (ticker,))
+            conn.executemany("INSERT OR REPLACE INTO prices (ticker, date, close) VALUES (?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO tickers (ticker, date_from, pulled) VALUES (?, ?, ?)", (ticker, date_from.isoformat(), pulled.isoformat()))
+
+
+# END OF FILE #
@@ -0,0 +1,45 @@
+##
+# Date: 17.10.2026
+
+from datetime import date
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+
+
+class PriceHistory(NamedTuple):
+    """
+    History of one ticker from `first_day` to `last_day`. Only close values of trading days are stored, values of other days
+    are looked up as of the day (the last close on or before the day, the first close for days before the first trading day).
+    """
+    first_day: pd.Timestamp
+    last_day: pd.Timestamp
+    offsets: np.ndarray # trading days as numbers of days from `first_day` (shifted by `first_offset`)
+    closes: np.ndarray # float32 close value of each trading day
+    last_close: float # exact last close value, it is valid on `last_day` (it can be a live price of the day, see `FinanceData.set_last_close`)
+    first_offset: int = 0 # number of `first_day` in numbering of `offsets` (e.g. arrays of PriceStore number days from 1970-01-01)
+
+    def get_days(self) -> int:
+        """ Return number of calendar days of the history """
+        return (self.last_day - self.first_day).days + 1
+
+    def get_closes_as_of(self, offsets: np.ndarray) -> np.ndarray:
+        """ Return close values valid on days given as numbers of days from `first_day` """
+        positions = np.searchsorted(self.offsets, np.asarray(offsets) + self.first_offset, side='right') - 1
+        return self.closes[np.maximum(positions, 0)]
+
+    def get_close(self, day: date) -> float:
+        """ Return close value valid on the `day` """
+        return float(self.get_closes_as_of(np.array([(pd.Timestamp(day) - self.first_day).days]))[0])
+
+    def get_daily_closes(self) -> np.ndarray:
+        """ Return close values forward filled to every calendar day of the history """
+        days = self.get_days()
+        offsets = np.minimum(self.offsets.astype(np.intp) - self.first_offset, days)
+        # Each close is repeated until the next trading day, the first close is used for days before it as well
+        counts = np.diff(offsets, append=days)
+        counts[0] += offsets[0]
+        return np.repeat(self.closes, counts)
+
+
+# END OF FILE #
@@ -0,0 +1,196 @@
+##
+# Date: 17.10.2026
+
+import os
+import os.path as op
+import re
+import tempfile
+import time
+import numpy as np
+from datetime import date
+from typing import NamedTuple
+from AppPaths import get_data_directory
+
+
+# File format: header, shared date axis, directory of tickers and close values of tickers (all little-endian)
+STORE_MAGIC:bytes = b'IMPS'
+STORE_VERSION:int = 1
+_HEADER_DTYPE:np.dtype = np.dtype([('magic', 'S4'), ('version', '<u4'), ('tickers', '<u4'), ('days', '<u4')])
+# Close values of a ticker are one float32 array aligned to positions [start, start + length) of the date axis
+_DIRECTORY_DTYPE:np.dtype = np.dtype([('ticker', 'S32'), ('date_from', '<i4'), ('pulled', '<i4'), ('start', '<u4'), ('length', '<u4'),
+                                      ('offset', '<u8'), ('last_close', '<f8')])
+_EPOCH:date = date(1970, 1, 1)
+
+
+class StoredPrices(NamedTuple):
+    """ Close values of one ticker in the store, arrays are read-only views of the mapped file """
+    date_from: date # date from which the data were pulled
+    pulled: date # date of the download
+    days: np.ndarray # int32 days as numbers of days from 1970-01-01, slice of the shared date axis
+    closes: np.ndarray # float32 close value valid on each of `days` (the last close for days on which the ticker was not traded)
+    last_close: float # exact last close value
+
+
+def to_day_number(day: date) -> int:
+    """ Return number of days from 1970-01-01 to `day` """
+    return (day - _EPOCH).days
+
+
+def _from_day_number(number: int) -> date:
+    return date.fromordinal(_EPOCH.toordinal() + int(number))
+
+
+def get_default_path() -> str:
+    """ Return path of the store in directory `price_data` in application directory """
+    return op.join(get_data_directory("price_data"), "prices.store")
+
+
+def _get_version_pattern(path: str) -> re.Pattern:
+    """ Return pattern of names of versions of the store at `path`, e.g. `prices.<version>.store` for `prices.store` """
+    stem, extension = op.splitext(op.basename(path))
+    return re.compile(re.escape(stem) + r"\.\d{20}-\d+" + re.escape(extension))
+
+
+def _get_versions(path: str) -> list[str]:
+    """ Return paths of versions of the store at `path` sorted from the newest one """
+    directory = op.dirname(op.abspath(path))
+    pattern = _get_version_pattern(path)
+    try:
+        names = [name for name in os.listdir(directory) if pattern.fullmatch(name)]
+    except OSError:
+        return list()
+    return [op.join(directory, name) for name in sorted(names, reverse=True)]
+
+
+def _get_layout(tickers: int, days: int) -> tuple[int, int, int]:
+    """ Return offsets of the date axis, the directory and close values in the file """
+    axis = _HEADER_DTYPE.itemsize
+    directory = axis + 8 * ((4 * days + 7) // 8) # directory is aligned to 8 bytes
+    return axis, directory, directory + tickers * _DIRECTORY_DTYPE.itemsize
+
+
+class PriceStore:
+    """
+    Read-only columnar store of close prices in one memory-mapped file in directory `price_data`. There is one date axis shared
+    by all tickers and one contiguous float32 array of close values for each ticker, so the arrays can be used without copying
+    and processes which open the same store share its pages. The store is written as a whole (see `write`) into a new version
+    of the file, which is never changed afterwards, so opened stores are not affected by writes of other processes. Mapped files
+    cannot be replaced nor removed on Windows, therefore no file is replaced and old versions which are still mapped by another
+    process are removed by a later write.
+    """
+
+    def __init__(self, path: str|None=None) -> None:
+        """
+        path: path of the store, default is `price_data/prices.store` in application directory. The newest version of the store
+        (file `prices.<version>.store`) is opened. The store is empty if there is no version or no valid one (e.g. a file is
+        incomplete).
+        """
+        if path is None:
+            path = get_default_path()
+        self._path:str = path
+        self._file:np.memmap|None = None
+        self._axis:np.ndarray = np.zeros(0, dtype='<i4')
+        self._directory:np.ndarray = np.zeros(0, dtype=_DIRECTORY_DTYPE)
+        self._tickers:dict[str, int] = dict() # ticker: position in directory
+        # A version can be removed by a write of another process after it was listed, older versions are tried then
+        for version_path in _get_versions(path):
+            try:
+                self._open(version_path)
+                break
+            except (OSError, ValueError) as e:
+                print(f"Price store {version_path} is not used: {e}")
+                self._file = None
+
+
+    def _open(self, path: str) -> None:
+        if op.getsize(path) < _HEADER_DTYPE.itemsize:
+            raise ValueError("the file is incomplete")
+        file = np.memmap(path, dtype=np.uint8, mode='r')
+        header = np.frombuffer(file, dtype=_HEADER_DTYPE, count=1)[0]
+        if header['magic'] != STORE_MAGIC or header['version'] != STORE_VERSION:
+            raise ValueError("unknown file format")
+
+        axis_offset, directory_offset, closes_offset = _get_layout(int(header['tickers']), int(header['days']))
+        directory = np.frombuffer(file, dtype=_DIRECTORY_DTYPE, count=int(header['tickers']), offset=directory_offset)
+        ends = directory['offset'] + 4 * directory['length'].astype(np.uint64)
+        if len(file) < closes_offset or (len(directory) and ends.max() > len(file) - closes_offset):
+            raise ValueError("the file is incomplete")
+
+        self._file = file
+        self._axis = np.frombuffer(file, dtype='<i4', count=int(header['days']), offset=axis_offset)
+        self._directory = directory
+        self._closes_offset:int = closes_offset
+        self._tickers = {ticker.decode(): i for i, ticker in enumerate(directory['ticker'])}
+
+
+    def get_path(self) -> str:
+        """ Return path of the store (versions of the store are files next to it) """
+        return self._path
+
+
+    def get_tickers(self) -> list[str]:
+        return list(self._tickers.keys())
+
+
+    def get(self, ticker: str) -> StoredPrices|None:
+        """ Return stored close values of `ticker` (without copying) or `None` if the `ticker` is not stored """
+        if ticker not in self._tickers:
+            return None
+        entry = self._directory[self._tickers[ticker]]
+        start, length = int(entry['start']), int(entry['length'])
+        closes = np.frombuffer(self._file, dtype='<f4', count=length, offset=self._closes_offset + int(entry['offset']))
+        return StoredPrices(_from_day_number(entry['date_from']), _from_day_number(entry['pulled']), self._axis[start:start + length],
+                            closes, float(entry['last_close']))
+
+
+    @staticmethod
+    def write(path: str, prices: dict[str, StoredPrices]) -> str:
+        """
+        Write new version of store at `path` with `prices` of tickers and return path of the written file. Close values are aligned
+        to the date axis (union of days of all tickers), so values of days on which a ticker was not traded are its last close values.
+        The version appears at once under a name which no other file has. Older versions are removed if they are not in use.
+        Tickers with names longer than 32 bytes are not stored.
+        """
+        prices = {ticker: p for ticker, p in prices.items() if len(ticker.encode()) <= _DIRECTORY_DTYPE['ticker'].itemsize}
+        axis = np.unique(np.concatenate([p.days for p in prices.values()])).astype('<i4') if prices else np.zeros(0, dtype='<i4')
+        directory = np.zeros(len(prices), dtype=_DIRECTORY_DTYPE)
+        arrays:list[np.ndarray] = list()
+        offset = 0
+        for i, (ticker, p) in enumerate(prices.items()):
+            start, stop = np.searchsorted(axis, p.days[0]), np.searchsorted(axis, p.days[-1], side='right')
+            closes = p.closes[np.searchsorted(p.days, axis[start:stop], side='right') - 1].astype('<f4')
+            directory[i] = (ticker.encode(), to_day_number(p.date_from), to_day_number(p.pulled), start, stop - start, offset, p.last_close)
+            arrays.append(closes)
+            offset += closes.nbytes
+
+        axis_offset, directory_offset, _ = _get_layout(len(prices), len(axis))
+        header = np.array([(STORE_MAGIC, STORE_VERSION, len(prices), len(axis))], dtype=_HEADER_DTYPE)
+        stem, extension = op.splitext(op.abspath(path))
+        # Names of versions are ordered by time of writing, process id makes them unique
+        version_path = f"{stem}.{time.time_ns():020d}-{os.getpid()}{extension}"
+        descriptor, temp_path = tempfile.mkstemp(dir=op.dirname(version_path), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(header.tobytes())
+                file.write(axis.tobytes().ljust(directory_offset - axis_offset, b'\0'))
+                file.write(directory.tobytes())
+                for closes in arrays:
+                    file.write(closes.tobytes())
+            os.rename(temp_path, version_path)
+        except BaseException:
+            if op.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        # Versions written later by other processes are kept, removal of a version mapped on Windows fails until it is closed.
+        # File at `path` itself is a store written before the store had versions.
+        for old_path in [path] + _get_versions(path):
+            if op.basename(old_path) < op.basename(version_path) or old_path == path:
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        return version_path
+
+
+# END OF FILE #
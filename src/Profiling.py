@@ -0,0 +1,181 @@
+##
+# Date: 17.10.2026
+
+import atexit
+import cProfile
+import functools
+import multiprocessing
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable
+
+
+# Environment variables which enable timing spans and cProfile dump (see `enable`)
+PROFILE_ENV:str = 'IM_PROFILE'
+PROFILE_DUMP_ENV:str = 'IM_PROFILE_DUMP'
+
+_enabled:bool = False
+_dump_path:str|None = None
+_main_profile:cProfile.Profile|None = None
+_lock = threading.Lock()
+_spans:dict[str, dict[str|None, list[float]]] = dict() # phase: {key: [calls, total time, max time]}
+_stats:pstats.Stats|None = None # merged cProfile statistics of profiled threads
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    """ Measures time of one phase (and optional key, e.g. ticker) and records it when it ends """
+
+    __slots__ = ('_phase', '_key', '_start')
+
+    def __init__(self, phase: str, key: str|None) -> None:
+        self._phase = phase
+        self._key = key
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self._start
+        with _lock:
+            record = _spans.setdefault(self._phase, dict()).setdefault(self._key, [0, 0.0, 0.0])
+            record[0] += 1
+            record[1] += elapsed
+            record[2] = max(record[2], elapsed)
+
+
+def enable(dump_path: str|None=None) -> None:
+    """
+    Enable timing spans, the report is printed to standard error output when the application exits. If `dump_path` is given,
+    the main thread and loading threads are also profiled by cProfile and merged statistics are written to `dump_path`.
+    Environment variable `IM_PROFILE` is set as well, so that child processes (batch mode) measure phases too. Only the main process
+    writes the cProfile dump.
+    """
+    global _enabled, _dump_path
+    if not _enabled:
+        atexit.register(_finish)
+    _enabled = True
+    os.environ[PROFILE_ENV] = '1'
+    if dump_path and _dump_path is None:
+        _dump_path = dump_path
+        _start_profile()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def span(phase: str, key: str|None=None):
+    """ Return context manager which measures time of the `phase`. It does nothing if profiling is not enabled """
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(phase, key)
+
+
+def timed(phase: str, key_arg: int|None=None) -> Callable:
+    """
+    Decorator which measures each call of the function as the `phase`.
+    key_arg: position of argument used as key of the measurement (e.g. ticker), `self` is on position 0
+    """
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            key = str(args[key_arg]) if key_arg is not None and key_arg < len(args) else None
+            with _Span(phase, key):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def profile_thread(function: Callable) -> Callable:
+    """ Decorator for thread functions, the thread is profiled by cProfile if the cProfile dump is enabled """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if _dump_path is None:
+            return function(*args, **kwargs)
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(function, *args, **kwargs)
+        finally:
+            _add_profile(profile)
+    return wrapper
+
+
+def reset_process() -> None:
+    """
+    Clear state inherited from the parent process (initializer of forked worker processes). Measured data are cleared
+    and cProfile of the parent is stopped, the dump is written only by the parent process.
+    """
+    global _dump_path, _stats
+    if _main_profile is not None:
+        _main_profile.disable()
+    _dump_path = None
+    _stats = None
+    with _lock:
+        _spans.clear()
+
+
+def _start_profile() -> None:
+    """ Profile the calling (main) thread until the application exits """
+    global _main_profile
+    _main_profile = cProfile.Profile()
+    _main_profile.enable()
+
+
+def _add_profile(profile: cProfile.Profile) -> None:
+    global _stats
+    with _lock:
+        if _stats is None:
+            _stats = pstats.Stats(profile)
+        else:
+            _stats.add(profile)
+
+
+def get_report() -> str:
+    """ Return report of measured phases. Phases are sorted by total time, keys of each phase (e.g. tickers) as well """
+    lines = [f"{'phase':<40}{'calls':>8}{'total [s]':>12}{'mean [ms]':>12}{'max [ms]':>12}"]
+    with _lock:
+        phases = {phase: {key: list(record) for key, record in keys.items()} for phase, keys in _spans.items()}
+
+    def line(name: str, calls: int, total: float, maximum: float) -> str:
+        return f"{name[:40]:<40}{calls:>8}{total:>12.4f}{total / calls * 1000:>12.2f}{maximum * 1000:>12.2f}"
+
+    for phase, keys in sorted(phases.items(), key=lambda item: -sum(record[1] for record in item[1].values())):
+        records = keys.values()
+        lines.append(line(phase, sum(r[0] for r in records), sum(r[1] for r in records), max(r[2] for r in records)))
+        if len(keys) > 1 or None not in keys:
+            for key, (calls, total, maximum) in sorted(keys.items(), key=lambda item: -item[1][1]):
+                lines.append(line(f"  {key}", calls, total, maximum))
+    return "\n".join(lines)
+
+
+def print_report(title: str='Phase timing report') -> None:
+    """ Print report of measured phases to standard error output and clear measured data """
+    if not _spans:
+        return
+    print(f"{title}\n{get_report()}", file=sys.stderr)
+    with _lock:
+        _spans.clear()
+
+
+def _finish() -> None:
+    """ Print report and write cProfile dump when the application exits """
+    print_report()
+    if _dump_path is not None:
+        _main_profile.disable()
+        _add_profile(_main_profile)
+        _stats.dump_stats(_dump_path)
+        print(f"cProfile statistics were written to {_dump_path}", file=sys.stderr)
+
+
+if os.environ.get(PROFILE_ENV) or os.environ.get(PROFILE_DUMP_ENV):
+    enable(os.environ.get(PROFILE_DUMP_ENV) if multiprocessing.parent_process() is None else None)
+
+
+# END OF FILE #
@@ -0,0 +1,104 @@
+##
+# Date: 17.10.2026
+
+import atexit
+import multiprocessing
+import multiprocessing.pool
+import threading
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import Holdings as hd
+from PriceHistory import PriceHistory
+
+
+# Workers are started from a clean process (not forked from the application, whose other threads can hold locks)
+_CONTEXT = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+# Pool of worker processes, it is created on the first build and kept for next builds (reloads, currency switches)
+_pool:multiprocessing.pool.Pool|None = None
+_pool_workers:int = 0
+_pool_lock = threading.Lock()
+
+
+def _count_evolutions(chunk: tuple[str, tuple[int, int], list[tuple[int, int, np.ndarray, PriceHistory, float]]]) -> int:
+    """
+    Count evolutions of assets of `chunk` (name of shared matrix, its shape, tasks) and write them to their rows of the shared matrix.
+    Task is (row, position of the first day, packed records, price history, multiply). Return number of counted evolutions.
+    """
+    name, shape, tasks = chunk
+    memory = SharedMemory(name=name)
+    try:
+        matrix = np.ndarray(shape, buffer=memory.buf)
+        for row, start, records, history, multiply in tasks:
+            evolution = hd.count_value_evolution(records, history, multiply)
+            matrix[row, start:start + len(evolution)] = evolution
+        del matrix
+    finally:
+        memory.close()
+    return len(tasks)
+
+
+def _get_pool(workers: int) -> multiprocessing.pool.Pool:
+    """ Return the pool with `workers` processes, the pool is created again only if the number of workers changed """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.terminate()
+            _pool = _CONTEXT.Pool(processes=workers)
+            _pool_workers = workers
+        return _pool
+
+
+@atexit.register
+def shutdown() -> None:
+    """ Stop worker processes of the pool (it is called at exit) """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.terminate()
+            _pool.join()
+            _pool = None
+
+
+def build_evolution_matrix(tasks: list[tuple[int, int, np.ndarray, PriceHistory, float]], shape: tuple[int, int],
+                           workers: int) -> tuple[np.ndarray, SharedMemory]:
+    """
+    Count evolutions of assets in `workers` processes, which write them directly to a matrix of `shape` in shared memory, so that
+    evolutions are not sent back to this process. The processes are kept for next builds with the same number of `workers`.
+    tasks: (row of matrix, position of the first day of the asset, packed records, price history, multiply) for each asset
+    (see `Asset.get_evolution_inputs`)
+
+    Return the matrix (days without values are zero) and its shared memory. The matrix is a view of the shared memory, so the memory
+    must be kept until the matrix is dropped, then it is freed by `release`.
+    """
+    memory = SharedMemory(create=True, size=max(1, shape[0] * shape[1] * np.dtype(float).itemsize))
+    try:
+        matrix = np.ndarray(shape, buffer=memory.buf)
+        matrix[:] = 0
+        workers = max(1, min(workers, len(tasks)))
+        # Workers attach the memory for each chunk, so no process keeps the matrix mapped after the build
+        size = max(1, len(tasks) // (4 * workers))
+        chunks = [(memory.name, shape, tasks[i:i + size]) for i in range(0, len(tasks), size)]
+        for _ in _get_pool(workers).imap_unordered(_count_evolutions, chunks):
+            pass
+    except BaseException:
+        matrix = None
+        release(memory)
+        raise
+    finally:
+        # The memory stays mapped in this process, it is just not accessible by name anymore
+        memory.unlink()
+    return matrix, memory
+
+
+def release(memory: SharedMemory) -> None:
+    """ Free shared `memory` of evolution matrix, the matrix must not be used anymore """
+    try:
+        memory.close()
+    except BufferError:
+        # The matrix is still referenced, the memory is freed when it is garbage collected
+        pass
+
+
+# END OF FILE #
@@ -0,0 +1,118 @@
+##
+# Date: 17.10.2026
+
+import hashlib
+import json
+import os
+import os.path as op
+import pickle
+import struct
+import tempfile
+from typing import NamedTuple
+from AppPaths import get_data_directory
+import DataLoader as dl
+import FinDataPuller as fdp
+import Portfolio as pf
+import Profiling as prof
+
+
+# File format: magic, version, length of JSON header, length of pickled portfolio, SHA-256 of pickled portfolio, header, portfolio
+SNAPSHOT_MAGIC:bytes = b'IMSN'
+SNAPSHOT_VERSION:int = 3
+_PREFIX:struct.Struct = struct.Struct('<4sIIQ32s')
+
+
+class SnapshotKey(NamedTuple):
+    """ Data from which the portfolio was computed, the snapshot is used only if all of them are the same """
+    workbook_hash: str # SHA-256 of the workbook content
+    price_date: str # date on which history data were pulled
+    ecb_date: str # date of ECB data file
+
+
+def get_snapshot_path() -> str:
+    """ Return path of the snapshot of the last loaded portfolio in directory `snapshot_data` in application directory """
+    return op.join(get_data_directory("snapshot_data"), "portfolio.snapshot")
+
+
+def get_snapshot_key(xlsx_path: str, workbook_hash: str|None=None) -> SnapshotKey|None:
+    """
+    Return key of portfolio computed today from `xlsx_path` with content hash `workbook_hash` (the current content is hashed if it is `None`).
+    Return `None` if the workbook or ECB data are not available.
+    """
+    if workbook_hash is None:
+        try:
+            _, workbook_hash = dl.get_file_state(xlsx_path)
+        except OSError:
+            return None
+    ecb_date = pf.curr_conv.get_data_date()
+    if ecb_date is None:
+        return None
+    return SnapshotKey(workbook_hash, fdp.today.isoformat(), ecb_date.isoformat())
+
+
+@prof.timed('save_snapshot')
+def save_snapshot(portfolio: pf.Portfolio, path: str|None=None) -> None:
+    """
+    Save computed `portfolio` (assets, evolutions, cached tables and views in currencies) to snapshot file at `path` (default is
+    `get_snapshot_path()`). The file is replaced at once, so an interrupted save does not leave a partial snapshot.
+    """
+    if path is None:
+        path = get_snapshot_path()
+    loader = portfolio.get_data_loader()
+    xlsx_path = op.abspath(loader.get_path())
+    key = get_snapshot_key(xlsx_path, loader.get_file_hash())
+    if key is None:
+        return
+
+    header = json.dumps({'xlsx_path': xlsx_path, 'key': key._asdict()}).encode()
+    payload = pickle.dumps(portfolio, protocol=pickle.HIGHEST_PROTOCOL)
+    descriptor, temp_path = tempfile.mkstemp(dir=op.dirname(op.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(_PREFIX.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header), len(payload), hashlib.sha256(payload).digest()))
+            file.write(header)
+            file.write(payload)
+        os.replace(temp_path, path)
+    except BaseException:
+        if op.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+@prof.timed('load_snapshot')
+def load_snapshot(history_data_puller: fdp.FinanceData, xlsx_path: str|None=None, path: str|None=None) -> pf.Portfolio|None:
+    """
+    Return portfolio from snapshot file at `path` (default is `get_snapshot_path()`) if it was computed from `xlsx_path` (any workbook
+    if it is `None`) and its key is the same as the current key of the workbook (see `SnapshotKey`). Return `None` if there is no such
+    snapshot or the snapshot is stale, incomplete or invalid.
+    history_data_puller: data puller used by the portfolio for new assets
+    """
+    if path is None:
+        path = get_snapshot_path()
+    try:
+        with open(path, 'rb') as file:
+            magic, version, header_length, payload_length, checksum = _PREFIX.unpack(file.read(_PREFIX.size))
+            if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+                return None
+            header = json.loads(file.read(header_length))
+            if xlsx_path is not None and header['xlsx_path'] != op.abspath(xlsx_path):
+                return None
+            if SnapshotKey(**header['key']) != get_snapshot_key(header['xlsx_path']):
+                return None # workbook was changed or data are not from today
+            payload = file.read(payload_length)
+        if len(payload) != payload_length or hashlib.sha256(payload).digest() != checksum:
+            return None
+        portfolio = pickle.loads(payload)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Snapshot {path} is not used: {e}")
+        return None
+
+    if not isinstance(portfolio, pf.Portfolio):
+        return None
+    portfolio.set_history_data_puller(history_data_puller)
+    return portfolio
+
+
+# END OF FILE #
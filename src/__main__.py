@@ -5,15 +5,64 @@
 # Date: 14.07.2024
 
 
-import IM_gui as gui
-import Controller as ct
+import argparse
+import multiprocessing
+import sys
+
+
+def parse_arguments() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog='InvestManager', description="Invest Manager. Without workbooks the GUI application is started, "
+                                     "otherwise the given workbooks are computed in headless batch mode.")
+    parser.add_argument('workbooks', nargs='*', help=".xlsx portfolio files computed in batch mode")
+    parser.add_argument('-o', '--output', default='output', help="output directory of batch mode (default: output)")
+    parser.add_argument('-f', '--format', choices=['json', 'csv', 'parquet'], default='json', help="output format of batch mode (default: json)")
+    parser.add_argument('-c', '--currency', type=str.upper, default='EUR', help="uniform currency of batch mode (default: EUR)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="number of parallel processes of batch mode (default: number of CPUs)")
+    parser.add_argument('--consolidate', action='store_true', help="merge workbooks of batch mode into one portfolio with breakdown by workbooks")
+    parser.add_argument('--evolution-workers', type=int, default=0, metavar='N',
+                        help="count evolutions of assets in N processes when the GUI loads a workbook (default: 0, in the loading thread)")
+    parser.add_argument('--live-quotes', type=float, metavar='SECONDS',
+                        help="refresh prices of today every SECONDS seconds while the GUI shows a portfolio (default: off)")
+    parser.add_argument('--api-port', type=int, metavar='PORT', help="serve summary, assets and evolution of the loaded portfolio as JSON on PORT")
+    parser.add_argument('--api-host', default='127.0.0.1', help="address of the JSON API (default: 127.0.0.1)")
+    parser.add_argument('--profile', action='store_true', help="measure time of loading phases and print report on exit (or set IM_PROFILE=1)")
+    parser.add_argument('--profile-dump', metavar='FILE', help="write cProfile statistics of the application to FILE (or set IM_PROFILE_DUMP=FILE)")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    controller = ct.Controller()
+    multiprocessing.freeze_support() # batch mode processes in PyInstaller executable
+    args = parse_arguments()
+
+    if args.profile or args.profile_dump:
+        import Profiling as prof
+        prof.enable(args.profile_dump)
+
+    if args.workbooks:
+        import Batch as bt
+        if args.consolidate:
+            sys.exit(bt.run_consolidated(args.workbooks, args.output, args.format, args.currency, args.jobs))
+        sys.exit(bt.run_batch(args.workbooks, args.output, args.format, args.currency, args.jobs))
+
+    import IM_gui as gui
+    import Controller as ct
+
+    controller = ct.Controller(args.evolution_workers)
     view = gui.IMMainGui(controller)
     controller.set_view(view)
 
+    if args.api_port is not None:
+        import ApiServer as api
+        server = api.ApiServer(controller, args.api_host, args.api_port)
+        try:
+            server.start()
+            print(f"JSON API listens on http://{args.api_host}:{args.api_port}")
+        except OSError as e:
+            print(f"JSON API was not started: {e}", file=sys.stderr)
+
+    if args.live_quotes is not None:
+        controller.start_quote_refresh(args.live_quotes)
+
     view.open_main_window()
 
     
-    
\ No newline at end of file
@@ -0,0 +1,17 @@
+##
+# Date: 17.10.2026
+
+import os.path as op
+import sys
+import tempfile
+
+# Application modules and the offline market and ECB data of the benchmarks
+sys.path.insert(0, op.join(op.dirname(op.abspath(__file__)), '..', 'benchmarks'))
+import SyntheticData as sd
+
+# Fakes have to be installed before the tests import `Portfolio`
+DATA_DIRECTORY:str = tempfile.mkdtemp(prefix='im_tests_')
+sd.install_fakes(DATA_DIRECTORY)
+
+
+# END OF FILE #
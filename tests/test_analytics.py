@@ -0,0 +1,52 @@
+##
+# Date: 17.10.2026
+
+import numpy as np
+import Analytics as an
+
+
+def _series(values: list[float], start: int, days: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """ Return (values, inflows, outflows) of one series bought for 100 at position `start` of `days` days """
+    row = np.zeros((1, days))
+    row[0, start:start + len(values)] = values
+    inflows = np.zeros((1, days))
+    inflows[0, start] = 100.0
+    return row, inflows, np.zeros((1, days))
+
+
+def test_drawdown_of_loss_from_the_first_day():
+    values, inflows, outflows = _series([60.0, 50.0, 40.0], 0, 3)
+    analytics = an.compute_analytics(values, inflows, outflows, np.array([0]))
+    assert np.isclose(analytics.twr[0], -0.6)
+    assert np.isclose(analytics.max_drawdown[0], -0.6)
+
+
+def test_drawdown_does_not_depend_on_start_column():
+    results = list()
+    for start in (0, 3):
+        values, inflows, outflows = _series([60.0, 50.0, 80.0, 70.0], start, start + 4)
+        results.append(an.compute_analytics(values, inflows, outflows, np.array([start])).max_drawdown[0])
+    assert np.isclose(results[0], results[1])
+    assert np.isclose(results[0], -0.5)
+
+
+def test_update_last_day_matches_full_computation():
+    rng = np.random.default_rng(1)
+    days = 40
+    values = 100 * np.exp(np.cumsum(rng.normal(-0.01, 0.05, (3, days)), axis=1))
+    starts = np.array([0, 5, 20])
+    values[np.arange(days) < starts[:, np.newaxis]] = 0.0
+    inflows = np.zeros((3, days))
+    inflows[np.arange(3), starts] = values[np.arange(3), starts]
+    outflows = np.zeros((3, days))
+    analytics = an.compute_analytics(values, inflows, outflows, starts, window=10)
+
+    values[:, -1] *= np.array([0.5, 1.3, 0.9])
+    rows = np.arange(3)
+    an.update_last_day(analytics, rows, values[:, -2:], inflows[:, -1], outflows[:, -1], starts, window=10)
+    expected = an.compute_analytics(values, inflows, outflows, starts, window=10)
+    for name in ('growth', 'twr', 'annualized_return', 'max_drawdown', 'volatility'):
+        assert np.allclose(getattr(analytics, name), getattr(expected, name), equal_nan=True), name
+
+
+# END OF FILE #
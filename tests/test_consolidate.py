@@ -0,0 +1,34 @@
+##
+# Date: 17.10.2026
+
+from datetime import datetime
+from DataLoader import DataLoader
+
+
+def _loader(path: str, first_buy: datetime|None, invested: float, owned: float) -> DataLoader:
+    """ Return DataLoader with one asset as if it was read from workbook `path` """
+    loader = DataLoader()
+    loader._xlsx_path = path
+    loader._assets_data['TIC'] = {'Name': 'Ticker', 'Category': 'Stock', 'Currency': 'USD', 'Field': 'Tech', 'First buy': first_buy}
+    loader._results_data['TIC'] = {'TICKER': 'TIC', 'INVESTED': invested, 'Average buy value': invested / owned if owned else 0.0,
+                                   'OWNED': owned}
+    return loader
+
+
+def test_missing_first_buy_is_replaced():
+    first_buy = datetime(2020, 5, 1)
+    for loaders in ([_loader('a.xlsx', None, 0, 0), _loader('b.xlsx', first_buy, 100, 4)],
+                    [_loader('a.xlsx', first_buy, 100, 4), _loader('b.xlsx', None, 0, 0)]):
+        merged = DataLoader.consolidate(loaders)
+        assert merged.get_ticker_data('TIC')['info']['First buy'] == first_buy
+        assert merged.get_ticker_data('TIC')['results']['INVESTED'] == 100
+        assert set(merged.get_source_results()) == {'a.xlsx', 'b.xlsx'}
+
+
+def test_earliest_first_buy_is_used():
+    merged = DataLoader.consolidate([_loader('a.xlsx', datetime(2021, 1, 1), 50, 2), _loader('b.xlsx', datetime(2020, 1, 1), 30, 1)])
+    assert merged.get_ticker_data('TIC')['info']['First buy'] == datetime(2020, 1, 1)
+    assert merged.get_ticker_data('TIC')['results']['OWNED'] == 3
+
+
+# END OF FILE #
@@ -0,0 +1,55 @@
+##
+# Date: 17.10.2026
+
+import numpy as np
+import pytest
+import SyntheticData as sd
+import Controller as ct
+import Holdings as hd
+import SharedEvolution as se
+from Batch import ConsoleView
+
+
+@pytest.fixture(scope='module')
+def workbook(tmp_path_factory) -> str:
+    path = str(tmp_path_factory.mktemp('workbooks') / 'portfolio.xlsx')
+    sd.generate_workbook(path, 12, 20, 4)
+    return path
+
+
+def _load(path: str, evolution_workers: int=0) -> ct.Controller:
+    controller = ct.Controller(evolution_workers)
+    controller.set_view(ConsoleView(path))
+    assert controller.load_portfolio(path)
+    return controller
+
+
+def test_owned_shares_matrix_matches_each_asset(workbook):
+    portfolio = _load(workbook)._portfolio
+    assets = list(portfolio._assets.values())
+    ranges = [asset.get_evolution_days() for asset in assets]
+    starts = [portfolio._evolution_rows[asset.ticker][1] for asset in assets]
+    matrix = hd.count_owned_shares_matrix([asset.get_records() for asset in assets], [first_day for first_day, _ in ranges],
+                                          [days for _, days in ranges], starts, len(portfolio._dates))
+    for row, (asset, start, (first_day, days)) in enumerate(zip(assets, starts, ranges)):
+        assert np.array_equal(matrix[row, start:start + days], hd.count_owned_shares(asset.get_records(), first_day, days))
+        assert not matrix[row, :start].any() and not matrix[row, start + days:].any()
+
+
+def test_shared_matrix_matches_serial_build(workbook):
+    serial = _load(workbook)._portfolio
+    shared = _load(workbook, evolution_workers=2)._portfolio
+    try:
+        assert shared._shared_memory is not None
+        assert np.array_equal(serial._evolution_matrix, shared._evolution_matrix)
+        # The pool is kept, the next build uses the same worker processes
+        pool = se._pool
+        shared._reset_evolution_matrix()
+        shared._build_evolution_matrix()
+        assert se._pool is pool
+        assert np.array_equal(serial._evolution_matrix, shared._evolution_matrix)
+    finally:
+        se.shutdown()
+
+
+# END OF FILE #
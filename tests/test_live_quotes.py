@@ -0,0 +1,67 @@
+##
+# Date: 17.10.2026
+
+import numpy as np
+import pytest
+import SyntheticData as sd
+import Controller as ct
+from Batch import ConsoleView
+
+
+@pytest.fixture
+def controller(tmp_path) -> ct.Controller:
+    path = str(tmp_path / 'portfolio.xlsx')
+    sd.generate_workbook(path, 10, 20, 3)
+    controller = ct.Controller()
+    controller.set_view(ConsoleView(path))
+    assert controller.load_portfolio(path)
+    return controller
+
+
+def _collect(portfolio) -> dict:
+    """ Return outputs of `portfolio` in two currencies (the second currency is cached when the first one is updated) """
+    result = dict()
+    for currency in ('USD', 'EUR'):
+        portfolio.make_currency_conversion(currency)
+        result[currency] = (portfolio.get_summary_data(), portfolio.get_assets_data(), np.array([row[1:] for row in portfolio.get_analytics_data()]),
+                            portfolio.get_evolution_data().to_numpy().copy(), portfolio.get_evolution_aggregates(None, points=10).to_numpy().copy(),
+                            portfolio.get_current_portfolio_value())
+    return result
+
+
+def _assert_equal(result: dict, expected: dict) -> None:
+    for currency in expected:
+        summary, assets, analytics, evolution, aggregates, value = result[currency]
+        assert summary == expected[currency][0] and assets == expected[currency][1]
+        for computed, rebuilt in zip((analytics, evolution, aggregates), expected[currency][2:5]):
+            assert np.allclose(computed, rebuilt, equal_nan=True, rtol=1e-6)
+        assert np.isclose(value, expected[currency][5])
+
+
+def _quotes(portfolio, seed: int) -> dict[str, float]:
+    rng = np.random.default_rng(seed)
+    return {ticker: asset.get_current_asset_value() * rng.uniform(0.9, 1.1) for ticker, asset in portfolio._assets.items()}
+
+
+def test_live_update_matches_rebuild(controller):
+    portfolio = controller._portfolio
+    _collect(portfolio)
+    quotes = _quotes(portfolio, 0)
+    assert sorted(controller.apply_live_quotes({**quotes, 'UNKNOWN': 5.0, 'TIC0000': float('nan')})) == sorted(set(quotes) - {'TIC0000'})
+
+    rebuilt = controller.load_assets_data(controller._load_id, portfolio.get_data_loader().get_path())
+    _assert_equal(_collect(portfolio), _collect(rebuilt))
+
+
+def test_quotes_during_reload_are_applied(controller):
+    controller._load_id += 1
+    reloaded = controller.reload_assets_data(controller._load_id)
+    # Prices received while the reloaded portfolio is computed change only the current portfolio
+    controller.apply_live_quotes(_quotes(controller._portfolio, 1))
+    assert controller.finish_loading(controller._load_id, reloaded)
+
+    rebuilt = controller.load_assets_data(controller._load_id, reloaded.get_data_loader().get_path())
+    _assert_equal(_collect(controller._portfolio), _collect(rebuilt))
+
+
+# END OF FILE #
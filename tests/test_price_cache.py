@@ -0,0 +1,44 @@
+##
+# Date: 17.10.2026
+
+from datetime import timedelta
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import SyntheticData as sd
+import FinDataPuller as fdp
+from PriceCache import PriceCache
+
+
+class NanTicker(sd.FakeTicker):
+    """ Fake ticker whose history has missing close values (as yfinance returns for some days) """
+
+    downloads:list = list()
+
+    def history(self, start=None, end=None, raise_errors: bool=False, **kwargs) -> pd.DataFrame:
+        NanTicker.downloads.append(start)
+        frame = super().history(start, end, raise_errors, **kwargs)
+        frame.iloc[len(frame) // 2, 0] = np.nan
+        frame.iloc[-1, 0] = np.nan
+        return frame
+
+
+def test_missing_closes_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(fdp, 'yf', SimpleNamespace(Ticker=NanTicker))
+    cache = PriceCache(str(tmp_path / 'history.sqlite'))
+    date_from = fdp.today - timedelta(days=400)
+
+    finance_data = fdp.FinanceData(cache)
+    finance_data.pull_ticker_history_data('NAN', date_from)
+    _, _, closes = cache.load('NAN')
+    assert not closes.empty and not closes.isna().any()
+    assert np.isfinite(finance_data.get_history_prices('NAN').closes).all()
+
+    # The next day only values after the last cached close are downloaded, history is not pulled again
+    cache.store('NAN', date_from, fdp.today - timedelta(days=1), pd.Series(dtype=float))
+    NanTicker.downloads.clear()
+    fdp.FinanceData(cache).pull_ticker_history_data('NAN', date_from)
+    assert NanTicker.downloads == [closes.index[-1].date()]
+
+
+# END OF FILE #